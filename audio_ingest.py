@@ -0,0 +1,171 @@
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import librosa
+import numpy as np
+from numpy_processing import SAMPLE_RATE
+from instrumentation import stage
+
+# The ffmpeg binary used to decode compressed containers (mp4/webm/...) from memory; None if not installed
+FFMPEG = os.environ.get("MUSIFY_FFMPEG") or shutil.which("ffmpeg")
+CHUNK_SIZE = 64 * 1024
+
+def iter_chunks(source, chunk_size=CHUNK_SIZE):
+    """
+    Iterate over the bytes of an audio source in chunks.
+
+    Parameters:
+    source (bytes, file-like or iterable): Raw bytes, a readable binary stream (e.g. an open file or a BytesIO),
+        or an iterable of byte chunks (e.g. a download in progress).
+    chunk_size (int): The size of the chunks read from a stream.
+
+    Yields:
+    bytes: The consecutive chunks of the source.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        yield bytes(source)
+    elif hasattr(source, "read"):
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    else:
+        for chunk in source:
+            if chunk:
+                yield chunk
+
+def ffmpeg_blocks(source, sr=SAMPLE_RATE, block_seconds=1.0, ffmpeg=None, stage_name=None):
+    """
+    Decode compressed audio with an ffmpeg subprocess into mono float32 PCM blocks at `sr`.
+
+    The source is fed to ffmpeg's stdin from a background thread while the decoded samples are read
+    from its stdout, so decoding starts with the first chunk and overlaps with a download that is
+    still in progress. Stopping the iteration early terminates ffmpeg, and with it the feeding.
+
+    Parameters:
+    source (bytes, file-like or iterable): The compressed audio, see `iter_chunks`.
+    sr (int): The target sampling rate.
+    block_seconds (float): The duration of the decoded blocks.
+    ffmpeg (str, optional): The ffmpeg binary; defaults to `FFMPEG`.
+    stage_name (str, optional): The instrumentation stage the reads of decoded samples are timed into.
+
+    Yields:
+    numpy.ndarray: Consecutive float32 mono blocks at `sr`.
+    """
+    ffmpeg = ffmpeg or FFMPEG
+    if ffmpeg is None:
+        raise RuntimeError("ffmpeg is not installed (set MUSIFY_FFMPEG to its path)")
+
+    process = subprocess.Popen(
+        [ffmpeg, "-hide_banner", "-loglevel", "error", "-i", "pipe:0",
+         "-f", "f32le", "-acodec", "pcm_f32le", "-ac", "1", "-ar", str(sr), "pipe:1"],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+    )
+    feed_errors = []
+
+    def feed():
+        try:
+            for chunk in iter_chunks(source):
+                process.stdin.write(chunk)
+        except (BrokenPipeError, ValueError):
+            # ffmpeg exited (a decoding error, or the consumer stopped early)
+            pass
+        except Exception as e:
+            feed_errors.append(e)
+        finally:
+            try:
+                process.stdin.close()
+            except (BrokenPipeError, OSError):
+                pass
+
+    # Drain stderr concurrently, so a chatty ffmpeg can never block on a full pipe
+    stderr_chunks = []
+    threads = [threading.Thread(target=feed, daemon=True),
+               threading.Thread(target=lambda: stderr_chunks.append(process.stderr.read()), daemon=True)]
+    for thread in threads:
+        thread.start()
+
+    block_bytes = max(1, int(block_seconds * sr)) * 4
+    decoded_samples = 0
+    try:
+        while True:
+            if stage_name is None:
+                data = process.stdout.read(block_bytes)
+            else:
+                with stage(stage_name):
+                    data = process.stdout.read(block_bytes)
+            if not data:
+                break
+            block = np.frombuffer(data[:len(data) - len(data) % 4], dtype=np.float32)
+            decoded_samples += len(block)
+            yield block
+    finally:
+        if process.poll() is None:
+            process.kill()
+        process.stdout.close()
+        process.wait()
+        for thread in threads:
+            thread.join(timeout=1)
+
+    if feed_errors:
+        raise feed_errors[0]
+    if process.returncode != 0 or decoded_samples == 0:
+        message = b"".join(stderr_chunks).decode(errors="replace").strip()
+        raise ValueError(f"ffmpeg could not decode the audio: {message or f'exit code {process.returncode}'}")
+
+def decode_audio(source, sr=SAMPLE_RATE):
+    """
+    Decode a whole in-memory audio source into a mono signal at `sr`.
+
+    libsndfile decodes WAV, FLAC, OGG and MP3 straight from memory. Other containers (e.g. YouTube's
+    mp4/webm audio) are piped through ffmpeg, or written to a temporary file for librosa's audioread
+    fallback when ffmpeg is not installed.
+
+    Parameters:
+    source (bytes, file-like or iterable): The encoded audio, see `iter_chunks`.
+    sr (int): The target sampling rate.
+
+    Returns:
+    numpy.ndarray: The mono audio signal at `sr`.
+    """
+    data = source.getvalue() if hasattr(source, "getvalue") else b"".join(iter_chunks(source))
+    try:
+        y, _ = librosa.load(io.BytesIO(data), sr=sr)
+        return y
+    except Exception:
+        if FFMPEG is not None:
+            return np.concatenate(list(ffmpeg_blocks(data, sr, block_seconds=10.0)))
+
+    # audioread can only open a real file
+    with tempfile.NamedTemporaryFile() as temp_file:
+        temp_file.write(data)
+        temp_file.flush()
+        y, _ = librosa.load(temp_file.name, sr=sr)
+    return y
+
+def decode_stream(source, sr=SAMPLE_RATE, block_seconds=1.0):
+    """
+    Decode compressed audio incrementally while its bytes arrive.
+
+    With ffmpeg, blocks are yielded as soon as they are decoded; without it the whole source is
+    collected first and yielded as a single block.
+
+    Parameters:
+    source (bytes, file-like or iterable): The encoded audio, see `iter_chunks`.
+    sr (int): The target sampling rate.
+    block_seconds (float): The duration of the decoded blocks.
+
+    Yields:
+    numpy.ndarray: Consecutive float32 mono blocks at `sr`.
+    """
+    if FFMPEG is not None:
+        # Only the reads from ffmpeg are timed: waiting for the source (e.g. the network) happens in the feeder thread
+        yield from ffmpeg_blocks(source, sr, block_seconds, stage_name="decode")
+    else:
+        with stage("decode"):
+            y = decode_audio(source, sr)
+        yield y
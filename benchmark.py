@@ -0,0 +1,223 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from importlib import metadata
+import numpy as np
+import soundfile as sf
+from benchmark_feature_engine import synthesize_track
+
+STAGES = ['segment_music_files', 'load_and_process_audio', 'standardize_feature', 'augment_data',
+          'extract_audio_features', 'model.predict']
+
+def prepare_dataset(work_dir, genres=2, tracks_per_genre=2, duration=30, sr=22050):
+    """
+    Write a small synthetic GTZAN-like dataset: 30-second mono WAVs in Train/Test/Validation genre folders,
+    plus their 3-second segments in the same layout.
+
+    Returns:
+    tuple: The track directory and the segment directory.
+    """
+    from three_seconds_segmentation import segment_music_files
+
+    tracks_dir = os.path.join(work_dir, 'tracks')
+    segments_dir = os.path.join(work_dir, 'segments')
+    seed = 0
+    for subset in ['Train', 'Test', 'Validation']:
+        for genre in range(genres):
+            genre_dir = os.path.join(tracks_dir, subset, f"genre{genre}")
+            os.makedirs(genre_dir, exist_ok=True)
+            for track in range(tracks_per_genre):
+                sf.write(os.path.join(genre_dir, f"track{track}.wav"), synthesize_track(duration, sr, seed), sr,
+                         subtype='PCM_16')
+                seed += 1
+    segment_music_files(tracks_dir, segments_dir)
+    return tracks_dir, segments_dir
+
+def run_stage(stage, work_dir, repeats=3, batch_size=None, n_samples=512):
+    """
+    Time one pipeline stage in the current process.
+
+    Every stage is run once untimed to warm up caches, JIT kernels and graph tracing, then `repeats` times.
+
+    Parameters:
+    stage (str): One of `STAGES`.
+    work_dir (str): The directory prepared by `prepare_dataset`.
+    repeats (int): The number of timed runs.
+    batch_size (int): The batch size for the model.predict stage.
+    n_samples (int): The number of feature rows for the in-memory stages.
+
+    Returns:
+    dict: The wall times of every run, the best and median run, the items processed per run and the
+    peak resident set size of the process.
+    """
+    tracks_dir = os.path.join(work_dir, 'tracks')
+    segments_dir = os.path.join(work_dir, 'segments')
+    rng = np.random.default_rng(0)
+
+    if stage == 'segment_music_files':
+        from three_seconds_segmentation import segment_music_files
+        n_items = sum(len(files) for _, _, files in os.walk(tracks_dir))
+
+        def run():
+            output_dir = tempfile.mkdtemp(dir=work_dir)
+            segment_music_files(tracks_dir, output_dir)
+            shutil.rmtree(output_dir)
+    elif stage == 'load_and_process_audio':
+        from numpy_processing import load_and_process_audio
+        paths = [os.path.join(root, f) for root, _, files in os.walk(segments_dir) for f in sorted(files)]
+        n_items = len(paths)
+
+        def run():
+            for path in paths:
+                load_and_process_audio(path)
+    elif stage == 'standardize_feature':
+        from numpy_processing import standardize_feature
+        X = rng.standard_normal((n_samples, 153, 259), dtype=np.float32)
+        n_items = n_samples
+
+        def run():
+            standardize_feature(X)
+    elif stage == 'augment_data':
+        from data_augmentation import augment_data
+        X = rng.standard_normal((n_samples, 153, 259), dtype=np.float32)
+        y = np.eye(10, dtype=np.float32)[rng.integers(0, 10, n_samples)]
+        n_items = n_samples
+
+        def run():
+            augment_data(X, y, num_augmented_samples=n_samples, seed=0)
+    elif stage == 'extract_audio_features':
+        from numpy_extraction import extract_audio_features
+        n_items = sum(len(files) for _, _, files in os.walk(segments_dir))
+
+        def run():
+            output_dir = tempfile.mkdtemp(dir=work_dir)
+            extract_audio_features(segments_dir, output_dir)
+            shutil.rmtree(output_dir)
+    elif stage == 'model.predict':
+        from model import initialize_model
+        model = initialize_model()
+        X = rng.standard_normal((batch_size, 153, 259), dtype=np.float32)
+        n_items = batch_size
+
+        def run():
+            model.predict(X, batch_size=batch_size, verbose=0)
+    else:
+        raise ValueError(f"Unknown stage {stage!r}")
+
+    run()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+
+    return {
+        "runs": times,
+        "best_seconds": min(times),
+        "median_seconds": float(np.median(times)),
+        "items": n_items,
+        "items_per_second": n_items / min(times),
+        # ru_maxrss is reported in kilobytes on Linux and in bytes on macOS
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 ** 2 if sys.platform == 'darwin' else 1024),
+    }
+
+def run_suite(stages=STAGES, batch_sizes=(1, 8, 32), repeats=3, genres=2, tracks_per_genre=2, n_samples=512):
+    """
+    Run every stage in a fresh process on the same synthetic dataset, so the peak RSS of one stage
+    is not inflated by the stages before it.
+
+    Returns:
+    dict: The environment, the configuration and the results per stage.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        prepare_dataset(work_dir, genres, tracks_per_genre)
+        jobs = []
+        for stage in stages:
+            if stage == 'model.predict':
+                jobs.extend((f"model.predict[batch_size={b}]", stage, b) for b in batch_sizes)
+            else:
+                jobs.append((stage, stage, None))
+
+        for name, stage, batch_size in jobs:
+            # Spawn rather than fork, so no stage inherits the memory or thread pools of another
+            with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn')) as executor:
+                results[name] = executor.submit(run_stage, stage, work_dir, repeats, batch_size, n_samples).result()
+            print(f"{name:<40}{results[name]['best_seconds']:>10.3f} s{results[name]['peak_rss_mb']:>10.0f} MB")
+
+    return {
+        "environment": environment_info(),
+        "config": {"repeats": repeats, "genres": genres, "tracks_per_genre": tracks_per_genre,
+                   "n_samples": n_samples, "batch_sizes": list(batch_sizes)},
+        "stages": results,
+    }
+
+def environment_info():
+    """
+    Describe the machine and library versions a result was measured with.
+    """
+    versions = {}
+    for package in ['numpy', 'scipy', 'librosa', 'soundfile', 'tensorflow', 'tensorflow-cpu', 'keras']:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            pass
+    return {"python": platform.python_version(), "platform": platform.platform(), "cpu_count": os.cpu_count(),
+            "packages": versions}
+
+def compare_results(current, baseline, threshold=0.1):
+    """
+    Compare two benchmark results stage by stage.
+
+    A stage regresses when its best wall time or its peak RSS grew by more than `threshold`
+    (a fraction, 0.1 = 10%) over the baseline.
+
+    Returns:
+    list: A (stage, metric, baseline value, current value) tuple for every regression.
+    """
+    regressions = []
+    for name, result in current["stages"].items():
+        reference = baseline["stages"].get(name)
+        if reference is None:
+            continue
+        for metric in ['best_seconds', 'peak_rss_mb']:
+            if result[metric] > reference[metric] * (1 + threshold):
+                regressions.append((name, metric, reference[metric], result[metric]))
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark every pipeline stage on synthetic audio.")
+    parser.add_argument("--stages", nargs="+", default=STAGES, choices=STAGES)
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--genres", type=int, default=2)
+    parser.add_argument("--tracks-per-genre", type=int, default=2)
+    parser.add_argument("--samples", type=int, default=512, help="Feature rows for standardize_feature and augment_data")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="A previous results file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Allowed slowdown or memory growth, as a fraction")
+    args = parser.parse_args()
+
+    results = run_suite(args.stages, tuple(args.batch_sizes), args.repeats, args.genres, args.tracks_per_genre,
+                        args.samples)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare_results(results, baseline, args.threshold)
+        for name, metric, before, after in regressions:
+            print(f"Regression in {name}: {metric} {before:.3f} -> {after:.3f} ({after / before - 1:+.0%})")
+        if regressions:
+            raise SystemExit(1)
+        print(f"No regressions above {args.threshold:.0%} against {args.compare}")
@@ -0,0 +1,91 @@
+import argparse
+import os
+import tempfile
+import time
+import librosa
+import numpy as np
+import soundfile as sf
+from numpy_processing import SAMPLE_RATE, load_and_process_audio
+from feature_engine import extract_track_features
+from three_seconds_segmentation import split_into_segments
+
+def synthesize_track(duration=30, sr=SAMPLE_RATE, seed=0):
+    """
+    Generate a reproducible test signal: a few detuned harmonic notes plus noise.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(duration * sr)) / sr
+    y = np.zeros_like(t)
+    for start in range(0, duration, 2):
+        f0 = 110 * 2 ** (rng.integers(0, 24) / 12 + rng.uniform(-0.2, 0.2) / 12)
+        note = (t >= start) & (t < start + 2)
+        for harmonic in range(1, 5):
+            y[note] += np.sin(2 * np.pi * f0 * harmonic * t[note]) / harmonic
+    y += 0.05 * rng.standard_normal(len(t))
+    return (0.3 * y / np.abs(y).max()).astype(np.float32)
+
+def run_benchmark(audio_path=None, repeats=3):
+    """
+    Compare the per-segment `load_and_process_audio` path with the shared-STFT feature engine.
+
+    Parameters:
+    audio_path (str): An audio file to benchmark on. A synthetic 30-second track is used when omitted.
+    repeats (int): The number of timed runs for each path; the best run is reported.
+
+    Returns:
+    dict: The timings, the speedup and the maximum absolute difference between both outputs.
+    """
+    if audio_path:
+        y, _ = librosa.load(audio_path, sr=SAMPLE_RATE)
+    else:
+        y = synthesize_track()
+    segments = split_into_segments(y, SAMPLE_RATE)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # Write the segments losslessly, so both paths see exactly the same samples
+        segment_paths = []
+        for i, segment in enumerate(segments):
+            segment_path = os.path.join(temp_dir, f"segment_{i}.wav")
+            sf.write(segment_path, segment, SAMPLE_RATE, subtype="FLOAT")
+            segment_paths.append(segment_path)
+
+        # Warm up librosa's caches and numba kernels before timing
+        load_and_process_audio(segment_paths[0])
+        extract_track_features(y[:len(segments[0])])
+
+        per_segment_times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            reference = np.stack([load_and_process_audio(path) for path in segment_paths])
+            per_segment_times.append(time.perf_counter() - start)
+
+    engine_times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        features = extract_track_features(y)
+        engine_times.append(time.perf_counter() - start)
+
+    return {
+        "n_segments": len(segments),
+        "per_segment_seconds": min(per_segment_times),
+        "engine_seconds": min(engine_times),
+        "speedup": min(per_segment_times) / min(engine_times),
+        "max_abs_diff": float(np.abs(reference - features).max()),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the shared-STFT feature engine against load_and_process_audio.")
+    parser.add_argument("audio_path", nargs="?", help="Audio file to benchmark on (defaults to a synthetic 30-second track)")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--tolerance", type=float, default=1e-4, help="Maximum allowed absolute difference between both outputs")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.audio_path, args.repeats)
+    print(f"Segments:            {results['n_segments']}")
+    print(f"Per-segment path:    {results['per_segment_seconds']:.3f} s")
+    print(f"Feature engine:      {results['engine_seconds']:.3f} s")
+    print(f"Speedup:             {results['speedup']:.2f}x")
+    print(f"Max abs difference:  {results['max_abs_diff']:.2e}")
+
+    if results["max_abs_diff"] > args.tolerance:
+        raise SystemExit(f"Feature engine output differs from load_and_process_audio by more than {args.tolerance}")
@@ -0,0 +1,19 @@
+import hashlib
+
+def update_digest(digest, path, chunk_size=1024 * 1024):
+    """
+    Feed the bytes of a file into a hashlib digest, one chunk at a time so memory stays flat.
+
+    Returns:
+    The updated digest.
+    """
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest
+
+def file_sha256(path):
+    """
+    Compute the SHA-256 checksum of a file.
+    """
+    return update_digest(hashlib.sha256(), path).hexdigest()
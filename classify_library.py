@@ -0,0 +1,176 @@
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
+from tqdm import tqdm
+from inference import GENRES, prepare_batch
+
+AUDIO_EXTENSIONS = ('.wav', '.mp3', '.flac', '.ogg', '.m4a', '.au', '.aiff')
+
+def find_tracks(library_dir, extensions=AUDIO_EXTENSIONS):
+    """
+    List the audio files of a library in a fixed (sorted) order.
+    """
+    tracks = []
+    for root, dirs, files in os.walk(library_dir):
+        dirs.sort()
+        for filename in sorted(files):
+            if filename.lower().endswith(extensions):
+                tracks.append(os.path.join(root, filename))
+    return tracks
+
+def read_completed(output_path):
+    """
+    Read the tracks an earlier run already classified (or failed on) from its JSONL output.
+    A last line cut short by a crash is truncated away, so that track is simply classified again.
+    """
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+
+    with open(output_path, 'rb+') as f:
+        content = f.read()
+        complete_length = content.rfind(b'\n') + 1
+        if complete_length < len(content):
+            f.truncate(complete_length)
+
+    for line in content[:complete_length].splitlines():
+        try:
+            completed.add(json.loads(line)["path"])
+        except (ValueError, KeyError):
+            continue
+    return completed
+
+def featurize_tracks(tracks, decode_workers=4, max_pending=None):
+    """
+    Decode and featurize tracks in a pool of worker processes, yielding each track as soon as it is done.
+
+    Only `max_pending` tracks are submitted at a time, so the workers stay busy without the whole
+    library being queued in memory.
+
+    Args:
+        tracks (list): The audio files.
+        decode_workers (int): The number of decoding processes.
+        max_pending (int, optional): The maximum number of tracks being decoded at once. Defaults to 2 per worker.
+
+    Yields:
+        tuple: The path, its (n_segments, 153, 259) features and None, or the path, None and an error message.
+    """
+    max_pending = max_pending or 2 * decode_workers
+    with ProcessPoolExecutor(decode_workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+        remaining = iter(tracks)
+        pending = set()
+        while True:
+            for path in remaining:
+                pending.add(executor.submit(_featurize, path))
+                if len(pending) >= max_pending:
+                    break
+            if not pending:
+                break
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+def classify_library(library_dir, model, output_path, decode_workers=4, batch_size=256, max_pending=None):
+    """
+    Classify every track of a library and append one JSON line of genre probabilities per track.
+
+    Decoding and feature extraction run in a pool of worker processes (producers) while the current
+    process batches the segments of finished tracks into large `model.predict` calls (consumer).
+    Results are flushed as tracks complete, so a crashed run resumes where it stopped.
+
+    Args:
+        library_dir (str): The root directory of the music library.
+        model: The trained Keras model (or any object with a compatible `predict`).
+        output_path (str): The JSONL results file; existing results are kept and skipped.
+        decode_workers (int): The number of decoding processes.
+        batch_size (int): The number of segments per `model.predict` call.
+        max_pending (int, optional): The maximum number of tracks being decoded at once. Defaults to 2 per worker.
+
+    Returns:
+        dict: The number of classified and failed tracks and the throughput in tracks per second.
+    """
+    completed = read_completed(output_path)
+    tracks = [path for path in find_tracks(library_dir) if path not in completed]
+
+    classified = failed = 0
+    start = time.perf_counter()
+    with open(output_path, 'a') as output, \
+            tqdm(total=len(tracks), desc="Classifying tracks", unit="track") as progress:
+        ready = []
+        ready_segments = 0
+
+        def write(record):
+            output.write(json.dumps(record) + '\n')
+
+        def flush_ready():
+            nonlocal classified, ready_segments
+            batch = np.concatenate([features for _, features in ready])
+            predictions = model.predict(batch, batch_size=batch_size, verbose=0)
+            offset = 0
+            for path, features in ready:
+                track_predictions = predictions[offset:offset + len(features)]
+                offset += len(features)
+                # Calculate the cumulative probabilities for each genre
+                genre_probabilities = np.sum(track_predictions, axis=0) / len(track_predictions)
+                write({
+                    "path": path,
+                    "genre": GENRES[int(np.argmax(genre_probabilities))],
+                    "probabilities": {GENRES[i]: round(float(p), 6) for i, p in enumerate(genre_probabilities)},
+                    "segments": len(features),
+                })
+            output.flush()
+            classified += len(ready)
+            progress.update(len(ready))
+            ready.clear()
+            ready_segments = 0
+
+        for path, features, error in featurize_tracks(tracks, decode_workers, max_pending):
+            if error is not None:
+                write({"path": path, "error": error})
+                output.flush()
+                failed += 1
+                progress.update(1)
+                continue
+            ready.append((path, features))
+            ready_segments += len(features)
+
+            if ready_segments >= batch_size:
+                flush_ready()
+
+        if ready:
+            flush_ready()
+
+    elapsed = time.perf_counter() - start
+    return {
+        "classified": classified,
+        "failed": failed,
+        "skipped": len(completed),
+        "tracks_per_second": (classified + failed) / elapsed if elapsed > 0 else 0.0,
+    }
+
+def _featurize(path):
+    try:
+        return path, prepare_batch(path), None
+    except Exception as e:
+        return path, None, f"{type(e).__name__}: {e}"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Classify the genre of every track in a music library.")
+    parser.add_argument("library_dir")
+    parser.add_argument("--model", default="musify_app.keras", help="A .keras model or a .tflite/.onnx export")
+    parser.add_argument("--output", default="genres.jsonl", help="JSONL results file; an interrupted run resumes from it")
+    parser.add_argument("--decode-workers", type=int, default=os.cpu_count())
+    parser.add_argument("--batch-size", type=int, default=256, help="Segments per model.predict call")
+    args = parser.parse_args()
+
+    # Imported here so the spawned decode workers never load TensorFlow
+    from inference_backend import load_backend
+    summary = classify_library(args.library_dir, load_backend(args.model), args.output, args.decode_workers,
+                               args.batch_size)
+    print(f"Classified {summary['classified']} tracks ({summary['failed']} failed, {summary['skipped']} already done) "
+          f"at {summary['tracks_per_second']:.2f} tracks/s")
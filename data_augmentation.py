@@ -1,59 +1,90 @@
 import numpy as np
 
-def augment_data(X_train, y_train, num_augmented_samples=8000):
+def augment_data(X_train, y_train, num_augmented_samples=8000, batch_size=64, seed=None):
     """
     Augment the training data using various techniques suitable for audio features.
+
+    Augmented samples are generated in (batch_size, 153, 259) blocks directly into one
+    preallocated output array that starts with the original samples.
+
+    Parameters:
+    X_train (numpy.ndarray): The training features, shaped (n_samples, n_features, n_frames).
+    y_train (numpy.ndarray): The one-hot training labels.
+    num_augmented_samples (int): The number of augmented samples to append.
+    batch_size (int): The number of samples augmented together.
+    seed (int): Seed of the random generator, for reproducible augmentation.
+
+    Returns:
+    tuple: The original plus augmented features and labels.
+    """
+    rng = np.random.default_rng(seed)
+    n_samples = len(X_train)
+
+    # Preallocate the output and copy the original samples into it
+    X_augmented = np.empty((n_samples + num_augmented_samples,) + X_train.shape[1:], dtype=X_train.dtype)
+    y_augmented = np.empty((n_samples + num_augmented_samples,) + y_train.shape[1:], dtype=y_train.dtype)
+    X_augmented[:n_samples] = X_train
+    y_augmented[:n_samples] = y_train
+
+    # Generate the augmented samples block by block
+    for start in range(n_samples, n_samples + num_augmented_samples, batch_size):
+        stop = min(start + batch_size, n_samples + num_augmented_samples)
+        X_augmented[start:stop], y_augmented[start:stop] = augment_batch(X_train, y_train, stop - start, rng)
+
+    return X_augmented, y_augmented
+
+def augment_batch(X_train, y_train, batch_size, rng):
+    """
+    Draw a batch of random training samples and augment each one independently.
+
+    Parameters:
+    X_train (numpy.ndarray): The training features, shaped (n_samples, n_features, n_frames).
+    y_train (numpy.ndarray): The one-hot training labels.
+    batch_size (int): The number of augmented samples to generate.
+    rng (numpy.random.Generator): The random generator to draw from.
+
+    Returns:
+    tuple: The augmented features and labels of the batch.
     """
-    X_augmented = []
-    y_augmented = []
-
-    # Append original samples to X_augmented and y_augmented
-    X_augmented.extend(X_train)
-    y_augmented.extend(y_train)
-
-    # Generate and append augmented samples to X_augmented and y_augmented
-    for _ in range(num_augmented_samples):
-        # Select a random sample from the training data
-        idx = np.random.randint(0, len(X_train))
-        sample = X_train[idx].copy()
-        label = y_train[idx]
-
-        # Apply augmentation techniques...
-        # Random scaling
-        scale_factor = np.random.uniform(0.9, 1.1)
-        sample *= scale_factor
-
-        # Random noise
-        noise_factor = np.random.uniform(-0.01, 0.01)
-        sample += noise_factor
-
-        # Time shifting
-        shift_factor = np.random.uniform(-0.1, 0.1)
-        sample = np.roll(sample, int(len(sample) * shift_factor), axis=0)
-
-        # Feature masking
-        mask_ratio = np.random.uniform(0.0, 0.2)
-        mask_length = int(len(sample) * mask_ratio)
-        mask_start = np.random.randint(0, len(sample) - mask_length)
-        sample[mask_start:mask_start + mask_length] = 0.0
-
-        # Mixup
-        if np.random.uniform() < 0.5:
-            idx2 = np.random.randint(0, len(X_train))
-            sample2 = X_train[idx2]
-            label2 = y_train[idx2]
-            mixup_factor = np.random.uniform(0, 1)
-            sample = mixup_factor * sample + (1 - mixup_factor) * sample2
-            label = mixup_factor * label + (1 - mixup_factor) * label2
-
-        # Normalize the augmented sample
-        augmented_sample = (sample - np.mean(sample)) / np.std(sample)
-
-        # Append the augmented sample and label
-        X_augmented.append(augmented_sample)
-        y_augmented.append(label)
-
-    # Determine the input_shape after augmentation
-    input_shape = X_augmented[0].shape
-
-    return np.array(X_augmented), np.array(y_augmented)
\ No newline at end of file
+    n_samples = len(X_train)
+    n_rows = X_train.shape[1]
+    rows = np.arange(n_rows)
+
+    # Select random samples from the training data, already time shifted: rolling every sample
+    # along axis 0 (like np.roll) is folded into the row gather, since it commutes with scaling and noise
+    idx = rng.integers(0, n_samples, batch_size)
+    shift = (n_rows * rng.uniform(-0.1, 0.1, batch_size)).astype(int)
+    source_rows = (rows[None, :] - shift[:, None]) % n_rows
+    samples = np.asarray(X_train[idx[:, None], source_rows], dtype=X_train.dtype)
+    labels = y_train[idx].astype(y_train.dtype)
+
+    # Apply augmentation techniques...
+    # Random scaling
+    scale_factor = rng.uniform(0.9, 1.1, batch_size).astype(samples.dtype)
+    samples *= scale_factor[:, None, None]
+
+    # Random noise
+    noise_factor = rng.uniform(-0.01, 0.01, batch_size).astype(samples.dtype)
+    samples += noise_factor[:, None, None]
+
+    # Feature masking
+    mask_length = (n_rows * rng.uniform(0.0, 0.2, batch_size)).astype(int)
+    mask_start = rng.integers(0, n_rows - mask_length)
+    mask = (rows[None, :] >= mask_start[:, None]) & (rows[None, :] < (mask_start + mask_length)[:, None])
+    samples[mask] = 0.0
+
+    # Mixup, for about half of the samples
+    mixed = np.flatnonzero(rng.uniform(size=batch_size) < 0.5)
+    if len(mixed) > 0:
+        idx2 = rng.integers(0, n_samples, len(mixed))
+        mixup_factor = rng.uniform(0, 1, len(mixed))
+        sample_factor = mixup_factor.astype(samples.dtype)[:, None, None]
+        samples[mixed] = sample_factor * samples[mixed] + (1 - sample_factor) * X_train[idx2]
+        label_factor = mixup_factor.astype(labels.dtype)[:, None]
+        labels[mixed] = label_factor * labels[mixed] + (1 - label_factor) * y_train[idx2]
+
+    # Normalize every augmented sample
+    samples -= samples.mean(axis=(1, 2), keepdims=True)
+    samples /= samples.std(axis=(1, 2), keepdims=True)
+
+    return samples, labels
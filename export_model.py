@@ -0,0 +1,153 @@
+import argparse
+import json
+import os
+import time
+import numpy as np
+import tensorflow as tf
+from keras.models import load_model
+from inference_backend import load_backend
+from feature_dataset import load_feature_arrays
+
+def load_calibration_sample(features_dir, n_samples=200, seed=0):
+    """
+    Draw a random calibration sample from the saved training features, without loading all of them.
+    """
+    X, _ = load_feature_arrays(features_dir, 'Train')
+    idx = np.sort(np.random.default_rng(seed).choice(len(X), size=min(n_samples, len(X)), replace=False))
+    return np.asarray(X[idx], dtype=np.float32)
+
+def export_tflite(model, output_path, quantization='float16', calibration_data=None):
+    """
+    Convert the Keras model to TFLite.
+
+    Args:
+        model: The trained Keras model.
+        output_path (str): The path of the .tflite file.
+        quantization (str): "float16" stores the weights as float16; "int8" quantizes weights and
+            activations to int8, calibrated on `calibration_data` (input and output stay float32);
+            None exports plain float32.
+        calibration_data (numpy.ndarray): Representative features for int8 calibration.
+
+    Returns:
+        str: The path of the exported model.
+    """
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if quantization == 'float16':
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization == 'int8':
+        if calibration_data is None:
+            raise ValueError("int8 quantization needs calibration data")
+
+        def representative_dataset():
+            for sample in calibration_data:
+                yield [sample[np.newaxis, ..., np.newaxis]]
+
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset
+    elif quantization is not None:
+        raise ValueError(f"Unknown quantization {quantization!r}")
+
+    with open(output_path, 'wb') as f:
+        f.write(converter.convert())
+    return output_path
+
+def export_onnx(model, output_path):
+    """
+    Convert the Keras model to ONNX with tf2onnx.
+    """
+    import tf2onnx
+    input_signature = [tf.TensorSpec((None,) + tuple(model.input_shape[1:]), tf.float32, name='features')]
+    tf2onnx.convert.from_keras(model, input_signature=input_signature, output_path=output_path)
+    return output_path
+
+def evaluate_backend(backend, X_test, y_test, batch_sizes=(1, 32), repeats=5, eval_batch_size=256):
+    """
+    Measure the test-set accuracy and the per-batch CPU latency of an inference backend.
+
+    Args:
+        backend: An object with a Keras-compatible `predict`.
+        X_test (numpy.ndarray): The test features (memory-mapped is fine).
+        y_test (numpy.ndarray): The one-hot test labels.
+        batch_sizes (tuple): The batch sizes to time.
+        repeats (int): The number of timed runs per batch size; the median is reported.
+        eval_batch_size (int): The batch size used for the accuracy pass.
+
+    Returns:
+        dict: The accuracy and the median latency in milliseconds per batch size.
+    """
+    correct = 0
+    for start in range(0, len(X_test), eval_batch_size):
+        predictions = backend.predict(np.asarray(X_test[start:start + eval_batch_size], dtype=np.float32),
+                                      batch_size=eval_batch_size, verbose=0)
+        correct += int(np.sum(np.argmax(predictions, axis=1) == np.argmax(y_test[start:start + eval_batch_size], axis=1)))
+
+    latency_ms = {}
+    for batch_size in batch_sizes:
+        batch = np.asarray(X_test[:batch_size], dtype=np.float32)
+        backend.predict(batch, batch_size=batch_size, verbose=0)  # warm up
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            backend.predict(batch, batch_size=batch_size, verbose=0)
+            timings.append((time.perf_counter() - start) * 1000)
+        latency_ms[str(batch_size)] = float(np.median(timings))
+
+    return {"accuracy": correct / len(X_test), "latency_ms": latency_ms}
+
+def export_and_report(model_path, features_dir, output_dir, formats=('float16', 'int8'), batch_sizes=(1, 32),
+                      n_calibration=200):
+    """
+    Export the model in every requested format and compare each export against the Keras baseline.
+
+    Returns:
+        dict: Per format, the file, its size in MB, the test accuracy and the per-batch latency.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    model = load_model(model_path)
+    name = os.path.splitext(os.path.basename(model_path))[0]
+
+    exports = {"keras": model_path}
+    for export_format in formats:
+        try:
+            if export_format == 'onnx':
+                exports['onnx'] = export_onnx(model, os.path.join(output_dir, f"{name}.onnx"))
+            else:
+                calibration_data = None
+                if export_format == 'int8':
+                    calibration_data = load_calibration_sample(features_dir, n_calibration)
+                quantization = None if export_format == 'float32' else export_format
+                exports[export_format] = export_tflite(model, os.path.join(output_dir, f"{name}_{export_format}.tflite"),
+                                                       quantization, calibration_data)
+        except ImportError as e:
+            print(f"Skipping {export_format} export: {e}")
+
+    X_test, y_test = load_feature_arrays(features_dir, 'Test')
+    report = {}
+    for export_format, path in exports.items():
+        backend = load_backend(path)
+        report[export_format] = dict(
+            file=path,
+            size_mb=os.path.getsize(path) / 1024 ** 2,
+            **evaluate_backend(backend, X_test, y_test, batch_sizes),
+        )
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export quantized versions of the model and compare them with Keras.")
+    parser.add_argument("--model", default="musify_app.keras")
+    parser.add_argument("--features-dir", default="3_sec_features")
+    parser.add_argument("--output-dir", default="exported_models")
+    parser.add_argument("--formats", nargs="+", default=["float16", "int8"], choices=["float32", "float16", "int8", "onnx"])
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 32])
+    parser.add_argument("--report", default="export_report.json")
+    args = parser.parse_args()
+
+    report = export_and_report(args.model, args.features_dir, args.output_dir, args.formats, tuple(args.batch_sizes))
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{'format':<10}{'size MB':>10}{'accuracy':>10}" + "".join(f"{f'ms@{b}':>10}" for b in args.batch_sizes))
+    for export_format, row in report.items():
+        print(f"{export_format:<10}{row['size_mb']:>10.1f}{row['accuracy']:>10.3f}"
+              + "".join(f"{row['latency_ms'][str(b)]:>10.1f}" for b in args.batch_sizes))
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+import tempfile
+import numpy as np
+from numpy_processing import SAMPLE_RATE, N_FFT, HOP_LENGTH, load_and_process_audio
+from instrumentation import count
+from checksums import update_digest
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "musify", "features")
+DEFAULT_MAX_CACHE_BYTES = 2 * 1024 ** 3 # 2 GiB
+FEATURE_VERSION = 1 # bump whenever the feature computation itself changes
+
+def feature_cache_key(file_path, **params):
+    """
+    Build a content-addressed cache key for the features of an audio file.
+
+    The key hashes the file's bytes together with every parameter that affects the features,
+    so renaming or copying a file still hits the cache while any parameter change misses it.
+
+    Parameters:
+    file_path (str): The path to the audio file.
+    **params: Extra parameters the features depend on (e.g. max_bins).
+
+    Returns:
+    str: A hex digest identifying the features.
+    """
+    digest = update_digest(hashlib.sha256(), file_path)
+    params = dict(params, sample_rate=SAMPLE_RATE, n_fft=N_FFT, hop_length=HOP_LENGTH, version=FEATURE_VERSION)
+    digest.update(json.dumps(params, sort_keys=True).encode())
+    return digest.hexdigest()
+
+def load_cached_features(key, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Return the cached features for a key, or None on a miss.
+    A hit refreshes the entry's modification time, which is what eviction orders by.
+    """
+    entry_path = _entry_path(key, cache_dir)
+    try:
+        features = np.load(entry_path)
+        os.utime(entry_path)
+        count("feature_cache_hits")
+        return features
+    except (OSError, ValueError):
+        count("feature_cache_misses")
+        return None
+
+def store_cached_features(key, features, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Store features under a key. The entry is written to a temporary file and renamed into
+    place, so concurrent workers never observe a partially written entry.
+    """
+    entry_path = _entry_path(key, cache_dir)
+    os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(entry_path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, features)
+        os.replace(temp_path, entry_path)
+    except OSError:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def prune_feature_cache(cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_CACHE_BYTES):
+    """
+    Evict the least recently used entries until the cache fits in `max_bytes`.
+
+    Parameters:
+    cache_dir (str): The cache directory.
+    max_bytes (int): The size limit of the cache.
+
+    Returns:
+    int: The number of evicted entries.
+    """
+    entries = []
+    for root, dirs, files in os.walk(cache_dir):
+        for filename in files:
+            if filename.endswith(".npy"):
+                stat = os.stat(os.path.join(root, filename))
+                entries.append((stat.st_mtime, stat.st_size, os.path.join(root, filename)))
+
+    total_bytes = sum(size for _, size, _ in entries)
+    evicted = 0
+    for _, size, entry_path in sorted(entries):
+        if total_bytes <= max_bytes:
+            break
+        try:
+            os.remove(entry_path)
+        except FileNotFoundError:
+            pass
+        total_bytes -= size
+        evicted += 1
+    return evicted
+
+def cached_load_and_process_audio(file_path, max_bins=128, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Cached version of `load_and_process_audio`. Only files whose content or feature
+    parameters are new are decoded and processed; everything else is read from the cache.
+
+    Parameters:
+    file_path (str): The path to the audio file.
+    max_bins (int): The maximum number of frequency bins to consider.
+    cache_dir (str): The cache directory.
+
+    Returns:
+    numpy.ndarray: The concatenated features (mel_db, chroma, mfcc).
+    """
+    try:
+        key = feature_cache_key(file_path, max_bins=max_bins)
+    except OSError:
+        # Unreadable files are reported by load_and_process_audio as usual
+        return load_and_process_audio(file_path, max_bins)
+
+    features = load_cached_features(key, cache_dir)
+    if features is None:
+        features = load_and_process_audio(file_path, max_bins)
+        # Failed extractions are not cached, so they are retried on the next run
+        if features.size > 0:
+            store_cached_features(key, features, cache_dir)
+    return features
+
+def _entry_path(key, cache_dir):
+    return os.path.join(cache_dir, key[:2], f"{key}.npy")
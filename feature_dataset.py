@@ -0,0 +1,65 @@
+import os
+import numpy as np
+import tensorflow as tf
+from feature_store import FeatureStore, is_feature_store
+
+def load_feature_arrays(features_dir, subset, mmap_mode='r'):
+    """
+    Open the saved features and labels of a subset without reading them into RAM.
+
+    A feature store in `<features_dir>/<subset>` (see `feature_store`) takes precedence over the
+    .npy files; its shards are then only opened when a batch needs them.
+
+    Parameters:
+    features_dir (str): The directory containing the `{subset}_features.npy` and `{subset}_labels.npy` files.
+    subset (str): Train, Test, or Validation.
+    mmap_mode (str): The numpy memory-map mode; None loads the arrays fully.
+
+    Returns:
+    tuple: The features (an array or a FeatureStore) and labels arrays.
+    """
+    store_dir = os.path.join(features_dir, subset)
+    if is_feature_store(store_dir):
+        X = FeatureStore(store_dir)
+        return X, X.labels()
+
+    X = np.load(os.path.join(features_dir, f"{subset}_features.npy"), mmap_mode=mmap_mode)
+    y = np.load(os.path.join(features_dir, f"{subset}_labels.npy"), mmap_mode=mmap_mode)
+    return X, y
+
+def make_feature_dataset(X, y, batch_size=32, shuffle_buffer=None, seed=None, num_parallel_calls=tf.data.AUTOTUNE):
+    """
+    Build a batched, prefetched tf.data.Dataset that reads samples from (memory-mapped) arrays on demand.
+
+    Only sample indices go through the shuffle buffer; each batch is then gathered from the arrays
+    on a worker thread, so the buffer costs a few bytes per sample and the features are only paged
+    in when a batch needs them.
+
+    Parameters:
+    X (numpy.ndarray): The features, typically opened with `load_feature_arrays`.
+    y (numpy.ndarray): The labels.
+    batch_size (int): The number of samples per batch.
+    shuffle_buffer (int): The shuffle buffer size in samples; None keeps the stored order (e.g. for validation).
+    seed (int): Seed of the shuffle.
+    num_parallel_calls (int): The number of batches gathered in parallel.
+
+    Returns:
+    tf.data.Dataset: The dataset of (features, labels) batches.
+    """
+    indices = tf.data.Dataset.range(len(X))
+    if shuffle_buffer:
+        indices = indices.shuffle(shuffle_buffer, seed=seed, reshuffle_each_iteration=True)
+
+    def gather(batch_indices):
+        # Reading rows in file order keeps the page-cache access pattern sequential
+        batch_indices = np.sort(batch_indices)
+        return X[batch_indices].astype(np.float32), y[batch_indices].astype(np.float32)
+
+    def load_batch(batch_indices):
+        X_batch, y_batch = tf.numpy_function(gather, [batch_indices], (tf.float32, tf.float32))
+        X_batch.set_shape((None,) + X.shape[1:])
+        y_batch.set_shape((None,) + y.shape[1:])
+        return X_batch, y_batch
+
+    dataset = indices.batch(batch_size).map(load_batch, num_parallel_calls=num_parallel_calls)
+    return dataset.prefetch(tf.data.AUTOTUNE)
@@ -0,0 +1,95 @@
+import librosa
+import numpy as np
+import scipy.fft
+from numpy_processing import SAMPLE_RATE, N_FFT, HOP_LENGTH, standardize_feature
+from three_seconds_segmentation import split_into_segments
+from instrumentation import stage, count
+
+N_MFCC = 13 # number of MFCC coefficients
+N_MFCC_MELS = 128 # librosa.feature.mfcc computes its own 128-band mel spectrogram
+TOP_DB = 80.0 # dynamic range librosa.power_to_db clips to
+
+def extract_track_features(y, sr=SAMPLE_RATE, max_bins=128, segment_duration=3, batch_size=32):
+    """
+    Slice a decoded track into segments and extract the model input for every segment.
+
+    Parameters:
+    y (numpy.ndarray): The mono audio signal.
+    sr (int): The sampling rate of the signal.
+    max_bins (int): The maximum number of frequency bins to consider.
+    segment_duration (int): The duration of each audio segment in seconds.
+    batch_size (int): The number of segments transformed together, which bounds peak memory on long tracks.
+
+    Returns:
+    numpy.ndarray: The stacked features with shape (n_segments, n_features, n_frames), e.g. (n_segments, 153, 259).
+    """
+    segments = split_into_segments(y, sr, segment_duration)
+    n_frames = 1 + segments.shape[1] // HOP_LENGTH
+    features = np.empty((len(segments), max_bins + 12 + N_MFCC, n_frames), dtype=np.float32)
+    for start in range(0, len(segments), batch_size):
+        features[start:start + batch_size] = extract_segment_features(segments[start:start + batch_size], sr, max_bins)
+    return features
+
+def extract_segment_features(segments, sr=SAMPLE_RATE, max_bins=128):
+    """
+    Extract mel-spectrogram, chroma, and MFCC features for a batch of equal-length segments.
+
+    The power spectrogram is computed once, in a single batched STFT, and the mel-dB, chroma and
+    MFCC features are all derived from it. The output matches calling `process_audio` on each
+    segment separately.
+
+    Parameters:
+    segments (numpy.ndarray): The audio segments with shape (n_segments, segment_samples).
+    sr (int): The sampling rate of the segments.
+    max_bins (int): The maximum number of frequency bins to consider.
+
+    Returns:
+    numpy.ndarray: The concatenated, standardized features with shape (n_segments, max_bins + 25, n_frames).
+    """
+    # One STFT shared by every feature
+    with stage("stft"):
+        S = np.abs(librosa.stft(segments, n_fft=N_FFT, hop_length=HOP_LENGTH)) ** 2
+
+    # Mel-Spectrogram in dB relative to each segment's own peak
+    with stage("mel"):
+        log_mel = _log_power(_mel_spectrogram(S, sr, max_bins))
+        mel_db = log_mel - log_mel.max(axis=(1, 2), keepdims=True)
+        mel_db = np.maximum(mel_db, -TOP_DB)
+
+    # Chroma, with the tuning estimated per segment like chroma_stft does
+    with stage("chroma"):
+        chroma = np.empty((len(S), 12, S.shape[-1]), dtype=S.dtype)
+        for i, segment_S in enumerate(S):
+            tuning = librosa.estimate_tuning(S=segment_S, sr=sr, bins_per_octave=12)
+            chroma[i] = _chroma_filterbank(sr, tuning) @ segment_S
+        chroma = librosa.util.normalize(chroma, norm=np.inf, axis=-2)
+
+    # MFCC from the log mel-spectrogram, clipped to TOP_DB below each segment's peak
+    with stage("mfcc"):
+        if max_bins != N_MFCC_MELS:
+            log_mel = _log_power(_mel_spectrogram(S, sr, N_MFCC_MELS))
+        log_mel = np.maximum(log_mel, log_mel.max(axis=(1, 2), keepdims=True) - TOP_DB)
+        mfcc = scipy.fft.dct(log_mel, axis=-2, type=2, norm="ortho")[:, :N_MFCC, :]
+    count("segments_featurized", len(segments))
+
+    # Standardize every window along its time axis and concatenate
+    with stage("standardize"):
+        return np.concatenate(
+            (standardize_feature(mel_db), standardize_feature(chroma), standardize_feature(mfcc)), axis=1
+        )
+
+def _mel_spectrogram(S, sr, n_mels):
+    mel_basis = librosa.filters.mel(sr=sr, n_fft=N_FFT, n_mels=n_mels)
+    return np.einsum("mf,...ft->...mt", mel_basis, S, optimize=True)
+
+def _log_power(S, amin=1e-10):
+    return 10.0 * np.log10(np.maximum(amin, S))
+
+_chroma_filterbanks = {}
+
+def _chroma_filterbank(sr, tuning):
+    # Tuning estimates are quantized to 0.01 semitones, so only a handful of filterbanks are ever built
+    key = (sr, float(tuning))
+    if key not in _chroma_filterbanks:
+        _chroma_filterbanks[key] = librosa.filters.chroma(sr=sr, n_fft=N_FFT, tuning=tuning, n_chroma=12)
+    return _chroma_filterbanks[key]
@@ -0,0 +1,181 @@
+import math
+import os
+import numpy as np
+import soundfile as sf
+from concurrent.futures import ProcessPoolExecutor
+from sklearn.preprocessing import LabelEncoder
+from keras.utils import to_categorical
+from tqdm import tqdm
+from numpy_processing import SAMPLE_RATE, HOP_LENGTH
+from feature_engine import extract_track_features
+from feature_cache import (DEFAULT_MAX_CACHE_BYTES, feature_cache_key, load_cached_features,
+                           store_cached_features, prune_feature_cache)
+from numpy_extraction import list_audio_files, finalize_features, _open_output, _close_output, _write_output
+from split_manifest import read_manifest, manifest_subset
+from inference import load_audio
+from three_seconds_segmentation import split_into_segments
+import instrumentation
+from instrumentation import stage, count
+
+def extract_features_for_all_sets(parent_dir, output_dir, max_bins=128, segment_duration=3, num_workers=1,
+                                  cache_dir=None, max_cache_bytes=DEFAULT_MAX_CACHE_BYTES, segments_dir=None,
+                                  manifest_path=None):
+    """
+    Segments the full-length tracks of every subset in memory and extracts their features
+    straight into the per-subset feature arrays, without writing segment WAVs in between.
+
+    Each track is decoded once at the feature sampling rate. Its segments own a fixed block of rows
+    in a preallocated, memory-mapped `{subset}_features.npy`, so the output is deterministic and
+    memory stays flat whichever worker finishes first.
+
+    Parameters:
+    parent_dir (str): The path to the directory containing the Train, Test, and Validation subdirectories
+        of full-length tracks (e.g. "divided_files").
+    output_dir (str): The path to the directory where the features and labels will be saved.
+    max_bins (int): The maximum number of frequency bins to consider.
+    segment_duration (int): The duration of each audio segment in seconds.
+    num_workers (int): The number of worker processes. 1 extracts in the current process.
+    cache_dir (str): Optional feature cache directory; unchanged tracks are read from the cache.
+    max_cache_bytes (int): The size limit of the feature cache.
+    segments_dir (str): Optional directory to also write the segment WAVs to, for debugging only.
+    manifest_path (str): Optional split manifest (see `split_manifest`). The tracks of every subset are
+        read from it, straight from the original dataset, and `parent_dir` is not used.
+
+    Returns:
+    None
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Create a LabelEncoder object
+    label_encoder = LabelEncoder()
+
+    segment_samples = int(segment_duration * SAMPLE_RATE)
+    feature_shape = (max_bins + 12 + 13, 1 + segment_samples // HOP_LENGTH)
+
+    manifest = read_manifest(manifest_path) if manifest_path else None
+
+    # Iterate over Train, Test, and Validation subdirectories
+    for subset in ['Train', 'Test', 'Validation']:
+        if manifest is not None:
+            filepaths, genre_labels = manifest_subset(manifest, subset)
+            if not filepaths:
+                print(f"Skipping {subset}: {manifest_path} has no {subset} files")
+                continue
+        else:
+            subset_dir = os.path.join(parent_dir, subset)
+            if not os.path.isdir(subset_dir):
+                print(f"Skipping {subset}: {subset_dir} does not exist")
+                continue
+            filepaths, genre_labels = list_audio_files(subset_dir)
+        tracks = [(path, genre) for path, genre in zip(filepaths, genre_labels) if path.lower().endswith('.wav')]
+
+        # Reserve a block of rows for every track, sized from its header
+        counts = [count_segments(path, segment_duration) for path, _ in tracks]
+        offsets = np.concatenate(([0], np.cumsum(counts))).astype(int)
+
+        partial_path = os.path.join(output_dir, f"{subset}_features.partial.npy")
+        subset_data = np.lib.format.open_memmap(
+            partial_path, mode='w+', dtype=np.float32, shape=(int(offsets[-1]),) + feature_shape
+        )
+        del subset_data
+
+        tasks = []
+        for index, (path, genre) in enumerate(tracks):
+            track_segments_dir = os.path.join(segments_dir, subset, genre) if segments_dir else None
+            tasks.append((path, int(offsets[index]), counts[index], max_bins, segment_duration, cache_dir,
+                          track_segments_dir))
+
+        if num_workers > 1:
+            with ProcessPoolExecutor(num_workers, initializer=_open_output, initargs=(partial_path,)) as executor:
+                written = list(tqdm(executor.map(_extract_track_into_output, tasks, chunksize=4),
+                                    total=len(tasks), desc=f"Processing tracks in {subset}"))
+        else:
+            _open_output(partial_path)
+            written = [_extract_track_into_output(task) for task in tqdm(tasks, desc=f"Processing tracks in {subset}")]
+        _close_output()
+        if cache_dir is not None:
+            prune_feature_cache(cache_dir, max_cache_bytes)
+
+        # Fold the metrics recorded in the worker processes into this one
+        for _, metrics in written:
+            instrumentation.merge(metrics)
+        written = [rows for rows, _ in written]
+
+        # Keep the rows that were actually written, labelled with their track's genre
+        succeeded = np.zeros(int(offsets[-1]), dtype=bool)
+        segment_labels = np.empty(int(offsets[-1]), dtype=object)
+        for index, (_, genre) in enumerate(tracks):
+            succeeded[offsets[index]:offsets[index] + written[index]] = True
+            segment_labels[offsets[index]:offsets[index + 1]] = genre
+
+        save_path_features = os.path.join(output_dir, f"{subset}_features.npy")
+        save_path_labels = os.path.join(output_dir, f"{subset}_labels.npy")
+        with stage("finalize_features"):
+            finalize_features(partial_path, save_path_features, succeeded)
+
+        # Encode string labels to numerical values
+        subset_labels_encoded = label_encoder.fit_transform(segment_labels[succeeded].astype(str))
+
+        # Convert labels to categorical format
+        num_classes = len(label_encoder.classes_)
+        subset_labels_categorical = to_categorical(subset_labels_encoded, num_classes)
+
+        # Save labels for the current subset
+        np.save(save_path_labels, subset_labels_categorical)
+
+def count_segments(file_path, segment_duration=3):
+    """
+    Count the full segments a track yields at the feature sampling rate, from its header only.
+
+    Parameters:
+    file_path (str): The path to the audio file.
+    segment_duration (int): The duration of each audio segment in seconds.
+
+    Returns:
+    int: The number of segments, or 0 if the file cannot be read.
+    """
+    try:
+        info = sf.info(file_path)
+    except Exception as e:
+        print(f"Error reading {file_path}: {e}")
+        return 0
+    # librosa.load resamples to ceil(frames * target / native) samples
+    n_samples = math.ceil(info.frames * SAMPLE_RATE / info.samplerate)
+    return n_samples // int(segment_duration * SAMPLE_RATE)
+
+def _extract_track_into_output(task):
+    with stage("extract_track"):
+        written = _extract_track(*task)
+    count("tracks_extracted" if written else "extraction_failures")
+    return written, instrumentation.collect()
+
+def _extract_track(file_path, offset, expected_count, max_bins, segment_duration, cache_dir, segments_dir):
+    if expected_count == 0:
+        return 0
+    try:
+        features = None
+        if cache_dir is not None:
+            key = feature_cache_key(file_path, max_bins=max_bins, segment_duration=segment_duration)
+            features = load_cached_features(key, cache_dir)
+
+        if features is None or segments_dir is not None:
+            y = load_audio(file_path)
+            if segments_dir is not None:
+                _write_segments(y, file_path, segments_dir, segment_duration)
+            if features is None:
+                features = extract_track_features(y, SAMPLE_RATE, max_bins, segment_duration)
+                if cache_dir is not None:
+                    store_cached_features(key, features, cache_dir)
+
+        n_rows = min(len(features), expected_count)
+        _write_output(offset, features[:n_rows])
+        return n_rows
+    except Exception as e:
+        print(f"Error processing file {os.path.basename(file_path)}: {e}")
+        return 0
+
+def _write_segments(y, file_path, segments_dir, segment_duration):
+    os.makedirs(segments_dir, exist_ok=True)
+    for segment_count, segment in enumerate(split_into_segments(y, SAMPLE_RATE, segment_duration)):
+        new_filename = f"{os.path.splitext(os.path.basename(file_path))[0]}_segment_{segment_count}.wav"
+        sf.write(os.path.join(segments_dir, new_filename), segment, SAMPLE_RATE)
@@ -0,0 +1,281 @@
+import argparse
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+import numpy as np
+
+INDEX_FILE = "index.json"
+STORE_VERSION = 1
+
+class FeatureStore:
+    """
+    Read-only view of a sharded feature store, indexable like a (n_samples, n_features, n_frames) array.
+
+    Shards are opened on first access and kept in a small LRU cache: uncompressed shards are
+    memory-mapped, compressed ones are decompressed into memory. Rows are returned as `dtype`
+    (float32 by default) whatever the storage type, so the store can stand in for the memory-mapped
+    `{subset}_features.npy` in `make_feature_dataset`, `augment_batch` and friends.
+    """
+
+    def __init__(self, store_dir, max_cached_shards=8, dtype=np.float32):
+        with open(os.path.join(store_dir, INDEX_FILE)) as f:
+            index = json.load(f)
+        self.store_dir = store_dir
+        self.shards = index["shards"]
+        self.offsets = np.array([shard["offset"] for shard in self.shards] + [index["num_samples"]])
+        self.shape = (index["num_samples"],) + tuple(index["feature_shape"])
+        self.storage_dtype = np.dtype(index["dtype"])
+        self.dtype = np.dtype(dtype)
+        self.classes = index.get("classes")
+        self.num_classes = index["num_classes"]
+        self.max_cached_shards = max_cached_shards
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        # The labels are small, so the labels of every shard are read up front
+        self._labels = np.concatenate(
+            [np.load(os.path.join(store_dir, shard["labels"])) for shard in self.shards]
+        ) if self.shards else np.zeros(0, dtype=np.int64)
+
+    def __len__(self):
+        return self.shape[0]
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    def labels(self, one_hot=True):
+        """
+        The label of every sample, one-hot encoded like the saved `{subset}_labels.npy` by default.
+        """
+        if not one_hot:
+            return self._labels
+        return np.eye(self.num_classes, dtype=np.float32)[self._labels]
+
+    def take(self, indices):
+        """
+        Gather rows by index, in the given order. Only the shards holding the rows are opened.
+        """
+        indices = np.asarray(indices, dtype=np.int64).reshape(-1)
+        indices = np.where(indices < 0, indices + len(self), indices)
+        if len(indices) and (indices.min() < 0 or indices.max() >= len(self)):
+            raise IndexError(f"Index out of range for a store of {len(self)} samples")
+
+        output = np.empty((len(indices),) + self.shape[1:], dtype=self.dtype)
+        shard_ids = np.searchsorted(self.offsets, indices, side='right') - 1
+        for shard_id in np.unique(shard_ids):
+            selected = np.flatnonzero(shard_ids == shard_id)
+            output[selected] = self._shard(shard_id)[indices[selected] - self.offsets[shard_id]]
+        return output
+
+    def __getitem__(self, key):
+        if isinstance(key, tuple):
+            # Fancy indexing like X[rows, columns]: gather every row once, then index within the block
+            rows = np.arange(len(self))[key[0]] if isinstance(key[0], slice) else np.asarray(key[0])
+            unique_rows, inverse = np.unique(rows, return_inverse=True)
+            return self.take(unique_rows)[(inverse.reshape(rows.shape),) + key[1:]]
+        if isinstance(key, (int, np.integer)):
+            return self.take([key])[0]
+        if isinstance(key, slice):
+            return self.take(np.arange(len(self))[key])
+        return self.take(key)
+
+    def __array__(self, dtype=None, copy=None):
+        features = self.take(np.arange(len(self)))
+        return features if dtype is None else features.astype(dtype)
+
+    def iter_shards(self):
+        """
+        Yield the (features, labels) of every shard in order, e.g. for a sequential pass over the store.
+        """
+        for shard_id in range(len(self.shards)):
+            start, stop = self.offsets[shard_id], self.offsets[shard_id + 1]
+            yield np.asarray(self._shard(shard_id), dtype=self.dtype), self._labels[start:stop]
+
+    def _shard(self, shard_id):
+        with self._lock:
+            shard = self._cache.get(shard_id)
+            if shard is not None:
+                self._cache.move_to_end(shard_id)
+                return shard
+
+            path = os.path.join(self.store_dir, self.shards[shard_id]["file"])
+            if path.endswith('.npz'):
+                with np.load(path) as archive:
+                    shard = archive["features"]
+            else:
+                shard = np.load(path, mmap_mode='r')
+            self._cache[shard_id] = shard
+            if len(self._cache) > self.max_cached_shards:
+                self._cache.popitem(last=False)
+            return shard
+
+class FeatureStoreWriter:
+    """
+    Writes features into a sharded store, one fixed-size shard at a time.
+
+    Opening an existing store appends to it: new samples go into new shards and the existing ones
+    are never rewritten. The index is replaced atomically after every shard, so an interrupted
+    write leaves a readable store.
+    """
+
+    def __init__(self, store_dir, feature_shape=None, dtype='float16', shard_size=1024, compress=False,
+                 num_classes=None, classes=None):
+        self.store_dir = store_dir
+        os.makedirs(store_dir, exist_ok=True)
+        index_path = os.path.join(store_dir, INDEX_FILE)
+        if os.path.exists(index_path):
+            with open(index_path) as f:
+                self.index = json.load(f)
+            if feature_shape is not None and tuple(feature_shape) != tuple(self.index["feature_shape"]):
+                raise ValueError(f"Features of shape {tuple(feature_shape)} cannot be appended to a store of "
+                                 f"{tuple(self.index['feature_shape'])}")
+        else:
+            if feature_shape is None:
+                raise ValueError("A new store needs the feature shape")
+            self.index = {
+                "version": STORE_VERSION,
+                "feature_shape": list(feature_shape),
+                "dtype": np.dtype(dtype).name,
+                "num_classes": num_classes,
+                "classes": classes,
+                "num_samples": 0,
+                "shards": [],
+            }
+        self.shard_size = shard_size
+        self.compress = compress
+        self._features = []
+        self._labels = []
+        self._buffered = 0
+
+    def append(self, X, y):
+        """
+        Add samples to the store.
+
+        Args:
+            X (numpy.ndarray): The features, shaped (n_samples, n_features, n_frames).
+            y (numpy.ndarray): The labels, one-hot encoded or as class indices.
+        """
+        y = np.asarray(y)
+        if y.ndim == 2:
+            if self.index["num_classes"] is None:
+                self.index["num_classes"] = y.shape[1]
+            y = np.argmax(y, axis=1)
+        self._features.append(np.asarray(X, dtype=self.index["dtype"]))
+        self._labels.append(y.astype(np.int16))
+        self._buffered += len(X)
+        while self._buffered >= self.shard_size:
+            self._flush(self.shard_size)
+
+    def close(self):
+        """
+        Write the remaining samples as a last, smaller shard.
+        """
+        if self._buffered > 0:
+            self._flush(self._buffered)
+        if self.index["num_classes"] is None and self.index["num_samples"] > 0:
+            self.index["num_classes"] = int(max(np.load(os.path.join(self.store_dir, shard["labels"])).max()
+                                                for shard in self.index["shards"])) + 1
+        self._write_index()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    def _flush(self, count):
+        features = np.concatenate(self._features)
+        labels = np.concatenate(self._labels)
+        self._features, self._labels = [features[count:]], [labels[count:]]
+        self._buffered -= count
+
+        name = f"shard_{len(self.index['shards']):05d}"
+        if self.compress:
+            features_file = f"{name}.npz"
+            np.savez_compressed(os.path.join(self.store_dir, features_file), features=features[:count])
+        else:
+            features_file = f"{name}.npy"
+            np.save(os.path.join(self.store_dir, features_file), features[:count])
+        labels_file = f"{name}.labels.npy"
+        np.save(os.path.join(self.store_dir, labels_file), labels[:count])
+
+        self.index["shards"].append({"file": features_file, "labels": labels_file,
+                                     "offset": self.index["num_samples"], "count": int(count)})
+        self.index["num_samples"] += int(count)
+        self._write_index()
+
+    def _write_index(self):
+        index_path = os.path.join(self.store_dir, INDEX_FILE)
+        with open(f"{index_path}.tmp", 'w') as f:
+            json.dump(self.index, f, indent=2)
+        os.replace(f"{index_path}.tmp", index_path)
+
+def is_feature_store(path):
+    """
+    Whether `path` is a feature store directory.
+    """
+    return os.path.exists(os.path.join(path, INDEX_FILE))
+
+def convert_to_feature_store(features_dir, store_dir=None, subsets=('Train', 'Test', 'Validation'), dtype='float16',
+                             shard_size=1024, compress=False, remove_source=False):
+    """
+    Convert the `{subset}_features.npy`/`{subset}_labels.npy` files written by the extraction into
+    one feature store per subset, `<store_dir>/<subset>`.
+
+    The source arrays are memory-mapped and copied one shard at a time, so memory stays flat.
+
+    Parameters:
+    features_dir (str): The directory with the extracted feature files.
+    store_dir (str): The directory to create the stores in; defaults to `features_dir`.
+    subsets (tuple): The subsets to convert; missing ones are skipped.
+    dtype (str): The storage type, "float16" halves the size of float32 features.
+    shard_size (int): The number of samples per shard.
+    compress (bool): Compress every shard (zlib), trading read speed for disk space.
+    remove_source (bool): Delete the .npy files once their store is written.
+
+    Returns:
+    list: The directories of the stores written.
+    """
+    store_dir = store_dir or features_dir
+    written = []
+    for subset in subsets:
+        features_path = os.path.join(features_dir, f"{subset}_features.npy")
+        labels_path = os.path.join(features_dir, f"{subset}_labels.npy")
+        if not os.path.exists(features_path):
+            continue
+        X = np.load(features_path, mmap_mode='r')
+        y = np.load(labels_path, mmap_mode='r')
+
+        # Converting replaces an existing store instead of appending to it
+        subset_store = os.path.join(store_dir, subset)
+        if is_feature_store(subset_store):
+            shutil.rmtree(subset_store)
+        with FeatureStoreWriter(subset_store, X.shape[1:], dtype, shard_size, compress, num_classes=y.shape[1]) as writer:
+            for start in range(0, len(X), shard_size):
+                writer.append(X[start:start + shard_size], y[start:start + shard_size])
+        written.append(subset_store)
+
+        if remove_source:
+            del X, y
+            os.remove(features_path)
+            os.remove(labels_path)
+    return written
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert extracted feature files into sharded feature stores.")
+    parser.add_argument("features_dir", nargs="?", default="3_sec_features")
+    parser.add_argument("--store-dir", help="Defaults to the features directory")
+    parser.add_argument("--dtype", default="float16", choices=["float16", "float32"])
+    parser.add_argument("--shard-size", type=int, default=1024)
+    parser.add_argument("--compress", action="store_true")
+    parser.add_argument("--remove-source", action="store_true")
+    args = parser.parse_args()
+
+    for store in convert_to_feature_store(args.features_dir, args.store_dir, dtype=args.dtype,
+                                          shard_size=args.shard_size, compress=args.compress,
+                                          remove_source=args.remove_source):
+        size = sum(os.path.getsize(os.path.join(store, name)) for name in os.listdir(store))
+        print(f"{store}: {len(FeatureStore(store))} samples, {size / 1024 ** 2:.1f} MB")
@@ -0,0 +1,142 @@
+import os
+import librosa
+import numpy as np
+from numpy_processing import SAMPLE_RATE
+from feature_engine import extract_track_features, extract_segment_features
+from three_seconds_segmentation import split_into_segments
+from instrumentation import timed
+from audio_ingest import decode_audio
+
+# Define the genre labels
+GENRES = {
+    0: "Blues",
+    1: "Classical",
+    2: "Country",
+    3: "Disco",
+    4: "Hiphop",
+    5: "Jazz",
+    6: "Metal",
+    7: "Pop",
+    8: "Reggae",
+    9: "Rock"
+}
+
+@timed("decode")
+def load_audio(source, sr=SAMPLE_RATE):
+    """
+    Decode an audio source once, directly at the sampling rate the features use.
+
+    Parameters:
+    source (str, file-like or iterable): A path to an audio file, a file-like object (e.g. an upload or a BytesIO
+        buffer), or an iterable of byte chunks.
+    sr (int): The target sampling rate.
+
+    Returns:
+    numpy.ndarray: The mono audio signal at `sr`.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        y, _ = librosa.load(source, sr=sr)
+        return y
+
+    return decode_audio(source, sr)
+
+def prepare_batch(source, max_bins=128, segment_duration=3):
+    """
+    Decode an audio source, slice it into segments in memory and extract the model input for each segment.
+
+    Parameters:
+    source (str or file-like): A path to an audio file, or a file-like object.
+    max_bins (int): The maximum number of frequency bins to consider.
+    segment_duration (int): The duration of each audio segment in seconds.
+
+    Returns:
+    numpy.ndarray: The stacked features with shape (n_segments, n_features, n_frames), e.g. (n_segments, 153, 259).
+    """
+    y = load_audio(source)
+    if len(y) < segment_duration * SAMPLE_RATE:
+        raise ValueError(f"Audio is shorter than one {segment_duration}-second segment")
+
+    return extract_track_features(y, SAMPLE_RATE, max_bins, segment_duration)
+
+def spread_order(n_segments):
+    """
+    Order segment indices so that every prefix of the order is spread evenly across the track
+    (a van der Corput sequence: start, middle, quarters, eighths, ...).
+
+    Parameters:
+    n_segments (int): The number of segments.
+
+    Returns:
+    numpy.ndarray: A permutation of range(n_segments).
+    """
+    if n_segments <= 1:
+        return np.arange(n_segments)
+    bits = int(np.ceil(np.log2(n_segments)))
+    positions = np.arange(2 ** bits)
+    # Reverse the bits of every position to get the van der Corput sequence
+    reversed_positions = np.zeros_like(positions)
+    for bit in range(bits):
+        reversed_positions |= ((positions >> bit) & 1) << (bits - 1 - bit)
+    order = reversed_positions * n_segments // 2 ** bits
+    _, first = np.unique(order, return_index=True)
+    return order[np.sort(first)]
+
+def is_confident(genre_probabilities, segments_used, confidence=0.25, min_segments=10):
+    """
+    Check whether the leading genre's summed probability exceeds the runner-up's by
+    `confidence` per segment, once at least `min_segments` segments were evaluated.
+    """
+    runner_up, leader = np.sort(genre_probabilities)[-2:]
+    return segments_used >= min_segments and (leader - runner_up) / segments_used >= confidence
+
+def classify_anytime(model, source, max_bins=128, segment_duration=3, batch_size=8, confidence=0.25, min_segments=10,
+                     progress=None):
+    """
+    Classify a track from as few segments as needed.
+
+    Segments are featurized and predicted in small batches, in an order spread across the track,
+    and evaluation stops once the leading genre's summed probability exceeds the runner-up's by
+    `confidence` per segment used. This caps the work on long inputs such as hour-long mixes.
+
+    Parameters:
+    model: The trained model (anything with a Keras-compatible `predict`).
+    source (str or file-like): A path to an audio file, or a file-like object.
+    max_bins (int): The maximum number of frequency bins to consider.
+    segment_duration (int): The duration of each audio segment in seconds.
+    batch_size (int): The number of segments evaluated per step.
+    confidence (float): The per-segment probability margin between the two leading genres required to stop early.
+        Values above 1 disable early exit.
+    min_segments (int): The number of segments evaluated before early exit is considered.
+    progress (callable, optional): Called after every step with the running "genre", mean "probabilities"
+        per genre and number of "segments", like `streaming_inference.stream_predictions` yields them.
+
+    Returns:
+    tuple: The summed genre probabilities, the number of segments used and the total number of segments.
+    """
+    y = load_audio(source)
+    segments = split_into_segments(y, SAMPLE_RATE, segment_duration)
+    if len(segments) == 0:
+        raise ValueError(f"Audio is shorter than one {segment_duration}-second segment")
+
+    order = spread_order(len(segments))
+    genre_probabilities = None
+    segments_used = 0
+    for start in range(0, len(order), batch_size):
+        features = extract_segment_features(segments[np.sort(order[start:start + batch_size])], SAMPLE_RATE, max_bins)
+        predictions = model.predict(features, verbose=0)
+
+        # Calculate the cumulative probabilities for each genre
+        batch_probabilities = np.sum(predictions, axis=0)
+        genre_probabilities = batch_probabilities if genre_probabilities is None else genre_probabilities + batch_probabilities
+        segments_used += len(features)
+        if progress is not None:
+            progress({
+                "genre": GENRES[int(np.argmax(genre_probabilities))],
+                "probabilities": {GENRES[i]: float(p / segments_used) for i, p in enumerate(genre_probabilities)},
+                "segments": segments_used,
+            })
+
+        if is_confident(genre_probabilities, segments_used, confidence, min_segments):
+            break
+
+    return genre_probabilities, segments_used, len(segments)
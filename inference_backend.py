@@ -0,0 +1,107 @@
+import os
+import threading
+import numpy as np
+
+class KerasBackend:
+    """
+    The trained Keras model, as saved by `main.train_model`.
+    """
+
+    def __init__(self, model_path):
+        from keras.models import load_model
+        self.model = load_model(model_path)
+        self.input_shape = self.model.input_shape
+
+    def predict(self, x, batch_size=32, verbose=0):
+        return self.model.predict(x, batch_size=batch_size, verbose=verbose)
+
+class TFLiteBackend:
+    """
+    A (quantized) TFLite export of the model, run with the LiteRT interpreter when installed
+    and TensorFlow's bundled interpreter otherwise.
+
+    An interpreter is not thread safe, so every thread calling `predict` gets its own, created on
+    first use with `num_threads` threads. Concurrent callers (e.g. the app's job workers) then
+    predict in parallel, each on its share of the cores.
+    """
+
+    def __init__(self, model_path, num_threads=None):
+        try:
+            from ai_edge_litert.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+        self._make_interpreter = lambda: Interpreter(model_path=model_path, num_threads=num_threads or os.cpu_count())
+        self._local = threading.local()
+        interpreter = self._interpreter()
+        self.input = interpreter.get_input_details()[0]
+        self.output_index = interpreter.get_output_details()[0]['index']
+        self.input_shape = (None,) + tuple(int(size) for size in self.input['shape'][1:])
+
+    def predict(self, x, batch_size=32, verbose=0):
+        x = _with_channel_axis(x)
+        interpreter = self._interpreter()
+        outputs = []
+        for start in range(0, len(x), batch_size):
+            batch = x[start:start + batch_size]
+            # Resizing reallocates the tensors, so only do it when the batch size changes
+            if len(batch) != self._local.batch_size:
+                interpreter.resize_tensor_input(self.input['index'], (len(batch),) + tuple(self.input['shape'][1:]))
+                interpreter.allocate_tensors()
+                self._local.batch_size = len(batch)
+            interpreter.set_tensor(self.input['index'], batch)
+            interpreter.invoke()
+            outputs.append(interpreter.get_tensor(self.output_index).copy())
+        return np.concatenate(outputs)
+
+    def _interpreter(self):
+        if not hasattr(self._local, "interpreter"):
+            self._local.interpreter = self._make_interpreter()
+            self._local.batch_size = None
+        return self._local.interpreter
+
+class OnnxBackend:
+    """
+    An ONNX export of the model, run with onnxruntime on the CPU.
+    """
+
+    def __init__(self, model_path, num_threads=None):
+        import onnxruntime
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = num_threads or os.cpu_count()
+        self.session = onnxruntime.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+        self.input_shape = (None,) + tuple(self.session.get_inputs()[0].shape[1:])
+
+    def predict(self, x, batch_size=32, verbose=0):
+        x = _with_channel_axis(x)
+        return np.concatenate([
+            self.session.run(None, {self.input_name: x[start:start + batch_size]})[0]
+            for start in range(0, len(x), batch_size)
+        ])
+
+def load_backend(model_path, num_threads=None):
+    """
+    Load a model for inference, picking the backend from the file extension.
+
+    Every backend exposes a Keras-compatible `predict(x, batch_size, verbose)` and `input_shape`, so the app,
+    the inference service and the batch tooling can switch between them freely.
+
+    Args:
+        model_path (str): A `.keras`/`.h5` model, a `.tflite` export or an `.onnx` export.
+        num_threads (int, optional): The number of CPU threads for the TFLite and ONNX backends.
+
+    Returns:
+        The loaded backend.
+    """
+    extension = os.path.splitext(model_path)[1].lower()
+    if extension == '.tflite':
+        return TFLiteBackend(model_path, num_threads)
+    if extension == '.onnx':
+        return OnnxBackend(model_path, num_threads)
+    return KerasBackend(model_path)
+
+def _with_channel_axis(x):
+    # Exported models take the (153, 259, 1) input explicitly; Keras adds the channel axis itself
+    x = np.asarray(x, dtype=np.float32)
+    return x[..., np.newaxis] if x.ndim == 3 else x
@@ -0,0 +1,222 @@
+import argparse
+import asyncio
+import io
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from model import VARIANTS, initialize_model
+from inference import GENRES, prepare_batch
+from inference_backend import load_backend
+
+class MicroBatcher:
+    """
+    Merges the segment batches of concurrent requests into micro-batches before calling the model.
+
+    A micro-batch is dispatched as soon as it holds `max_batch_size` segments, or `max_wait_ms` after
+    its first request arrived, whichever comes first. The model runs on a single dedicated thread,
+    so the event loop keeps accepting and queueing requests while a batch is being predicted.
+    """
+
+    def __init__(self, model, max_batch_size=64, max_wait_ms=10, input_shape=(153, 259)):
+        self.model = model
+        self.input_shape = tuple(input_shape)
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = asyncio.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.batches = 0
+        self.segments = 0
+
+    async def predict(self, features):
+        """
+        Queue the segments of one request and wait for their predictions.
+
+        Args:
+            features (numpy.ndarray): The request's segments, shaped (n_segments, 153, 259).
+
+        Returns:
+            numpy.ndarray: The per-segment genre probabilities.
+        """
+        loop = asyncio.get_running_loop()
+        # Split oversized requests, so no queue item exceeds a micro-batch
+        futures = []
+        for start in range(0, len(features), self.max_batch_size):
+            future = loop.create_future()
+            await self.queue.put((features[start:start + self.max_batch_size], future))
+            futures.append(future)
+        return np.concatenate(await asyncio.gather(*futures))
+
+    async def run(self):
+        """
+        Collect and dispatch micro-batches forever.
+        """
+        loop = asyncio.get_running_loop()
+        pending = None
+        while True:
+            # Start a batch with the first waiting item, then fill it until it is full or the wait is over
+            items = [pending or await self.queue.get()]
+            pending = None
+            size = len(items[0][0])
+            deadline = loop.time() + self.max_wait
+            while size < self.max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if size + len(item[0]) > self.max_batch_size:
+                    pending = item
+                    break
+                items.append(item)
+                size += len(item[0])
+
+            try:
+                # Inside the try, so a batch that cannot be assembled only fails its own requests
+                batch = np.concatenate([features for features, _ in items])
+                predictions = await loop.run_in_executor(self.executor, self._predict, batch)
+            except Exception as e:
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.segments += len(batch)
+            start = 0
+            for features, future in items:
+                if not future.done():
+                    future.set_result(predictions[start:start + len(features)])
+                start += len(features)
+
+    def _predict(self, batch):
+        return self.model.predict(batch, batch_size=len(batch), verbose=0)
+
+def load_service_model(model_path, variant="baseline"):
+    """
+    Load the trained model. Weights-only files (e.g. `.weights.h5`) are loaded into the `variant`
+    architecture from `initialize_model`; full `.keras` models and `.tflite`/`.onnx` exports go through `load_backend`.
+    """
+    if model_path.endswith('.weights.h5'):
+        model = initialize_model(variant=variant)
+        model.load_weights(model_path)
+    else:
+        model = load_backend(model_path)
+    # Warm up, so the first request does not pay for graph tracing
+    model.predict(np.zeros((1,) + feature_shape(model), dtype=np.float32), verbose=0)
+    return model
+
+def feature_shape(model):
+    """
+    The (n_features, n_frames) shape of one segment the model takes, without the channel axis.
+    """
+    return tuple(int(size) for size in model.input_shape[1:3])
+
+async def handle_connection(reader, writer, batcher, decode_executor):
+    """
+    Serve one HTTP/1.1 request.
+
+    Routes:
+        POST /predict            Body: an audio file; it is decoded and segmented on the server.
+        POST /predict/features   Body: a .npy array of segment features shaped (n_segments, 153, 259).
+        GET  /health             Service and batching counters.
+    """
+    try:
+        request_line = await reader.readline()
+        method, path, _ = request_line.decode('latin-1').split(' ', 2)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, value = line.decode('latin-1').split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+        body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+        if method == 'GET' and path == '/health':
+            status, response = 200, {"status": "ok", "batches": batcher.batches, "segments": batcher.segments}
+        elif method == 'POST' and path in ('/predict', '/predict/features'):
+            start = time.perf_counter()
+            loop = asyncio.get_running_loop()
+            if path == '/predict':
+                # Decoding and feature extraction run on the worker pool, not on the event loop
+                features = await loop.run_in_executor(decode_executor, prepare_batch, io.BytesIO(body))
+            else:
+                features = np.load(io.BytesIO(body), allow_pickle=False).astype(np.float32)
+            if features.ndim != 3 or features.shape[1:] != batcher.input_shape:
+                raise ValueError(f"Expected features shaped (n_segments, {', '.join(map(str, batcher.input_shape))}), "
+                                 f"got {features.shape}")
+            predictions = await batcher.predict(features)
+
+            # Calculate the cumulative probabilities for each genre
+            genre_probabilities = np.sum(predictions, axis=0) / len(predictions)
+            status, response = 200, {
+                "genre": GENRES[int(np.argmax(genre_probabilities))],
+                "probabilities": {GENRES[i]: float(p) for i, p in enumerate(genre_probabilities)},
+                "segments": len(predictions),
+                "seconds": time.perf_counter() - start,
+            }
+        else:
+            status, response = 404, {"error": f"No route for {method} {path}"}
+    except Exception as e:
+        # Some decoder errors have an empty message, so always name the error
+        status, response = 400, {"error": f"{type(e).__name__}: {e}" if str(e) else type(e).__name__}
+
+    payload = json.dumps(response).encode()
+    reason = {200: 'OK', 400: 'Bad Request', 404: 'Not Found'}[status]
+    writer.write(f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode() + payload)
+    await writer.drain()
+    writer.close()
+
+async def serve(model_path, host='127.0.0.1', port=8000, unix_socket=None, max_batch_size=64, max_wait_ms=10,
+                decode_workers=4, variant="baseline"):
+    """
+    Run the inference service until it is cancelled.
+
+    Args:
+        model_path (str): The saved model, e.g. "musify_app.keras".
+        host (str): The address to listen on.
+        port (int): The TCP port to listen on.
+        unix_socket (str, optional): Listen on this Unix socket instead of TCP.
+        max_batch_size (int): The maximum number of segments per micro-batch.
+        max_wait_ms (float): The maximum time a request waits for a micro-batch to fill.
+        decode_workers (int): The number of threads decoding and featurizing uploaded audio.
+        variant (str): The model variant a weights-only file was trained with.
+    """
+    model = load_service_model(model_path, variant)
+    batcher = MicroBatcher(model, max_batch_size, max_wait_ms, feature_shape(model))
+    decode_executor = ThreadPoolExecutor(max_workers=decode_workers)
+
+    async def handler(reader, writer):
+        await handle_connection(reader, writer, batcher, decode_executor)
+
+    if unix_socket:
+        server = await asyncio.start_unix_server(handler, path=unix_socket)
+    else:
+        server = await asyncio.start_server(handler, host, port)
+    print(f"Serving on {unix_socket or f'http://{host}:{port}'}")
+
+    batch_task = asyncio.create_task(batcher.run())
+    async with server:
+        try:
+            await server.serve_forever()
+        finally:
+            batch_task.cancel()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve genre predictions with dynamic micro-batching.")
+    parser.add_argument("--model", default="musify_app.keras", help="A .keras model, a .tflite/.onnx export or a .weights.h5 file")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--unix-socket")
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=10)
+    parser.add_argument("--decode-workers", type=int, default=4)
+    parser.add_argument("--variant", default="baseline", choices=VARIANTS, help="The architecture of a .weights.h5 file")
+    args = parser.parse_args()
+
+    asyncio.run(serve(args.model, args.host, args.port, args.unix_socket, args.max_batch_size, args.max_wait_ms,
+                      args.decode_workers, args.variant))
@@ -0,0 +1,185 @@
+import atexit
+import json
+import math
+import multiprocessing
+import os
+import threading
+import time
+from contextlib import nullcontext
+from functools import wraps
+
+# Set MUSIFY_METRICS=1 to record metrics. When it is unset, `timed` returns the function unchanged
+# and `stage`/`count` return immediately, so the instrumented code pays (next to) nothing.
+ENABLED = os.environ.get('MUSIFY_METRICS', '').lower() not in ('', '0', 'false', 'off')
+# Where `write_snapshot` writes: a `.prom` file is written in the Prometheus textfile format, anything else as JSON
+METRICS_FILE = os.environ.get('MUSIFY_METRICS_FILE')
+
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, math.inf)
+
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+_disabled_stage = nullcontext()
+
+class _Stage:
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        observe(self.name, time.perf_counter() - self.start)
+        return False
+
+def stage(name):
+    """
+    Time a block of code into the histogram of a stage.
+
+        with stage("stft"):
+            S = librosa.stft(y)
+    """
+    return _Stage(name) if ENABLED else _disabled_stage
+
+def timed(name):
+    """
+    Decorator that times every call of a function into the histogram of a stage.
+    """
+    def decorator(func):
+        if not ENABLED:
+            return func
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with _Stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def observe(name, seconds):
+    """
+    Record one duration of a stage.
+    """
+    if not ENABLED:
+        return
+    bucket = next(i for i, bound in enumerate(BUCKETS) if seconds <= bound)
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = {"buckets": [0] * len(BUCKETS), "sum": 0.0, "count": 0}
+        histogram["buckets"][bucket] += 1
+        histogram["sum"] += seconds
+        histogram["count"] += 1
+
+def count(name, value=1):
+    """
+    Increase a counter, e.g. `count("files_decoded")` or `count("bytes_downloaded", len(data))`.
+    """
+    if not ENABLED:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+def snapshot():
+    """
+    Return a copy of every histogram and counter recorded so far.
+
+    Returns:
+        dict: "histograms" maps each stage to its per-bucket counts (not cumulative), "sum" and "count";
+        "counters" maps each counter to its value.
+    """
+    with _lock:
+        return {
+            "buckets": list(BUCKETS[:-1]) + ["+Inf"],
+            "histograms": {name: {"buckets": list(h["buckets"]), "sum": h["sum"], "count": h["count"]}
+                           for name, h in _histograms.items()},
+            "counters": dict(_counters),
+        }
+
+def reset():
+    """
+    Forget every recorded metric.
+    """
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+def collect():
+    """
+    Hand the metrics recorded in a worker process over to the parent.
+
+    Worker functions return the result of `collect()` next to their own result and the parent passes it
+    to `merge`. In the main process, or when metrics are off, there is nothing to hand over and None
+    is returned.
+    """
+    if not ENABLED or multiprocessing.parent_process() is None:
+        return None
+    metrics = snapshot()
+    reset()
+    return metrics
+
+def merge(metrics):
+    """
+    Add a snapshot (e.g. from `collect` in a worker process) to the metrics of this process.
+    """
+    if metrics is None:
+        return
+    with _lock:
+        for name, h in metrics["histograms"].items():
+            histogram = _histograms.setdefault(name, {"buckets": [0] * len(BUCKETS), "sum": 0.0, "count": 0})
+            histogram["buckets"] = [a + b for a, b in zip(histogram["buckets"], h["buckets"])]
+            histogram["sum"] += h["sum"]
+            histogram["count"] += h["count"]
+        for name, value in metrics["counters"].items():
+            _counters[name] = _counters.get(name, 0) + value
+
+def to_prometheus(prefix='musify'):
+    """
+    Render the metrics in the Prometheus text exposition format, e.g. for the node exporter's textfile collector.
+    """
+    metrics = snapshot()
+    lines = [f"# TYPE {prefix}_stage_seconds histogram"]
+    for name, h in sorted(metrics["histograms"].items()):
+        cumulative = 0
+        for bound, bucket_count in zip(metrics["buckets"], h["buckets"]):
+            cumulative += bucket_count
+            lines.append(f'{prefix}_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+        lines.append(f'{prefix}_stage_seconds_sum{{stage="{name}"}} {h["sum"]}')
+        lines.append(f'{prefix}_stage_seconds_count{{stage="{name}"}} {h["count"]}')
+    for name, value in sorted(metrics["counters"].items()):
+        lines.append(f"# TYPE {prefix}_{name}_total counter")
+        lines.append(f"{prefix}_{name}_total {value}")
+    return "\n".join(lines) + "\n"
+
+def write_snapshot(path=METRICS_FILE):
+    """
+    Write the metrics to `path`, as a Prometheus textfile when it ends in `.prom` and as JSON otherwise.
+
+    The file is replaced atomically, so a scraper never reads half of it. Does nothing when metrics
+    are off or no path is given.
+    """
+    if not ENABLED or not path:
+        return
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w') as f:
+        if path.endswith('.prom'):
+            f.write(to_prometheus())
+        else:
+            json.dump(snapshot(), f, indent=2)
+    os.replace(temp_path, path)
+
+def _reset_in_child():
+    # A forked worker starts with a copy of the parent's metrics; drop it so `collect` only hands over its own
+    global _lock
+    _lock = threading.Lock()
+    _histograms.clear()
+    _counters.clear()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_in_child)
+
+# Scripts write their metrics when they exit; worker processes hand theirs over with `collect` instead
+if ENABLED and multiprocessing.parent_process() is None:
+    atexit.register(write_snapshot)
@@ -0,0 +1,164 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+from instrumentation import count, observe
+
+# Concurrent classification jobs, and jobs allowed to wait for one of them, per app process
+MAX_WORKERS = int(os.environ.get('MUSIFY_WORKERS', max(1, (os.cpu_count() or 1) // 2)))
+MAX_QUEUED = int(os.environ.get('MUSIFY_MAX_QUEUED', 4 * MAX_WORKERS))
+# The CPU threads of one job's model calls, so that every worker predicting at once fills the cores exactly once
+THREADS_PER_JOB = max(1, (os.cpu_count() or 1) // MAX_WORKERS)
+
+class QueueFull(Exception):
+    """
+    Raised by `JobExecutor.submit` when the wait queue is full; the caller should ask the user to retry later.
+    """
+
+class Job:
+    """
+    A classification job submitted to a `JobExecutor`.
+
+    The job function receives the job as its first argument, to report progress (`job.progress`),
+    check `job.cancelled` and use its private scratch directory (`job.scratch_dir`).
+    """
+
+    def __init__(self, executor):
+        self._executor = executor
+        self._scratch_dir = None
+        self.future = None
+        self.submitted = time.perf_counter()
+        self.progress = None
+        self.cancelled = False
+
+    @property
+    def scratch_dir(self):
+        """
+        A directory only this job writes to, created on first use and deleted when the job ends.
+        """
+        if self._scratch_dir is None:
+            self._scratch_dir = tempfile.mkdtemp(prefix="musify_job_", dir=self._executor.scratch_root)
+        return self._scratch_dir
+
+    def position(self):
+        """
+        The place of this job in the queue (1 is the next job to start), 0 once it is running or done.
+        """
+        return self._executor._position(self)
+
+    def done(self):
+        return self.future.done()
+
+    def wait(self, timeout=None):
+        """
+        Wait up to `timeout` seconds for the job to end; returns whether it has.
+        """
+        try:
+            self.future.exception(timeout)
+        except (TimeoutError, CancelledError):
+            pass
+        return self.future.done()
+
+    def result(self, timeout=None):
+        return self.future.result(timeout)
+
+    def cancel(self):
+        """
+        Drop the job if it is still queued, or ask the running job function to stop.
+        """
+        self.cancelled = True
+        if self.future.cancel():
+            self._executor._dequeue(self)
+
+class JobExecutor:
+    """
+    A process-wide, bounded pool for the heavy CPU work of the app.
+
+    At most `max_workers` jobs run at a time and at most `max_queued` wait for a worker; further
+    submissions are rejected with `QueueFull` instead of piling up, so a burst of users sees a queue
+    position or a "busy" message while the admitted requests keep their latency.
+
+    Jobs run on threads: decoding, feature extraction and prediction release the GIL, and every job
+    shares the one model loaded by the process. Load a .tflite/.onnx backend with `THREADS_PER_JOB`
+    threads (see `model_provider.load_inference_model`): the TFLite backend gives every worker thread
+    its own interpreter, so the workers predict in parallel and together use each core once.
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS, max_queued=MAX_QUEUED, scratch_root=None):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.scratch_root = scratch_root
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="musify-job")
+        self._waiting = deque()
+        self._running = 0
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Queue `fn(job, *args, **kwargs)`.
+
+        Returns:
+        Job: The submitted job.
+
+        Raises:
+        QueueFull: If every worker is busy and `max_queued` jobs are already waiting.
+        """
+        job = Job(self)
+        with self._lock:
+            if self._running + len(self._waiting) >= self.max_workers + self.max_queued:
+                self.rejected += 1
+                count("jobs_rejected")
+                raise QueueFull("Every worker is busy and the queue is full, please try again shortly")
+            self._waiting.append(job)
+            job.future = self._pool.submit(self._run, job, fn, args, kwargs)
+        count("jobs_submitted")
+        return job
+
+    def stats(self):
+        """
+        The current load and the job counts since the executor was created.
+        """
+        with self._lock:
+            return {"running": self._running, "queued": len(self._waiting), "completed": self.completed,
+                    "failed": self.failed, "rejected": self.rejected}
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+    def _run(self, job, fn, args, kwargs):
+        with self._lock:
+            self._waiting.remove(job)
+            self._running += 1
+        observe("queue_wait", time.perf_counter() - job.submitted)
+        try:
+            result = fn(job, *args, **kwargs)
+            with self._lock:
+                self.completed += 1
+            return result
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            with self._lock:
+                self._running -= 1
+            if job._scratch_dir is not None:
+                shutil.rmtree(job._scratch_dir, ignore_errors=True)
+
+    def _position(self, job):
+        with self._lock:
+            try:
+                return self._waiting.index(job) + 1
+            except ValueError:
+                return 0
+
+    def _dequeue(self, job):
+        with self._lock:
+            if job in self._waiting:
+                self._waiting.remove(job)
@@ -1,70 +1,100 @@
+import os
+import time
 import numpy as np
-from dividing_data import divide_data
-from three_seconds_segmentation import segment_music_files
+from split_manifest import create_split_manifest
 from feature_extraction import extract_features_for_all_sets
-from data_augmentation import augment_data
+from streaming_augmentation import make_augmented_dataset
+from feature_dataset import load_feature_arrays, make_feature_dataset
+from feature_store import convert_to_feature_store
 from model import initialize_model
 import tensorflow as tf
 from tensorflow.keras.optimizers import Adam
-from tensorflow.keras.callbacks import EarlyStopping, ReduceLROnPlateau, ModelCheckpoint
-
-def load_audio_features():
-    X_train = np.load('3_sec_features/Train_features.npy')
-    y_train = np.load('3_sec_features/Train_labels.npy')
-    X_test = np.load('3_sec_features/Test_features.npy')
-    y_test = np.load('3_sec_features/Test_labels.npy')
-    X_val = np.load('3_sec_features/Validation_features.npy')
-    y_val = np.load('3_sec_features/Validation_labels.npy')
+from tensorflow.keras.callbacks import Callback, EarlyStopping, ReduceLROnPlateau, ModelCheckpoint
+import instrumentation
+from instrumentation import stage, count
+
+class EpochTimer(Callback):
+    # Records the wall time of every epoch, including validation, in the "train_epoch" histogram
+    def on_epoch_begin(self, epoch, logs=None):
+        self.start = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        instrumentation.observe("train_epoch", time.perf_counter() - self.start)
+        count("train_epochs")
+
+def load_audio_features(features_dir='3_sec_features', mmap_mode='r'):
+    # Memory-map the feature files, so samples are only read when a batch needs them
+    X_train, y_train = load_feature_arrays(features_dir, 'Train', mmap_mode)
+    X_test, y_test = load_feature_arrays(features_dir, 'Test', mmap_mode)
+    X_val, y_val = load_feature_arrays(features_dir, 'Validation', mmap_mode)
     return X_train, y_train, X_test, y_test, X_val, y_val
 
 
 
-def train_model(X_train, y_train, X_val, y_val):
-    # using data augmentation
-    X_augmented, y_augmented = augment_data(X_train, y_train)
+def train_model(X_train, y_train, X_val, y_val, num_augmented_samples=8000, batch_size=32, shuffle_buffer=10000,
+                model_variant="baseline", learning_rate=0.0005, dropout=0.6, epochs=100,
+                model_path='musify_app.keras', checkpoint_path='model_best.keras', verbose='auto'):
+    # using data augmentation, generated on the fly for every batch
+    if num_augmented_samples > 0:
+        train_dataset, steps_per_epoch = make_augmented_dataset(
+            X_train, y_train, batch_size=batch_size, num_augmented_samples=num_augmented_samples
+        )
+    else:
+        train_dataset = make_feature_dataset(X_train, y_train, batch_size=batch_size, shuffle_buffer=shuffle_buffer)
+        steps_per_epoch = None
+    val_dataset = make_feature_dataset(X_val, y_val, batch_size=batch_size)
 
     # Get the input shape for model
-    input_shape = X_augmented.shape[1:]
+    input_shape = X_train.shape[1:]
     input_shape = (input_shape[0], input_shape[1], 1)
 
-    # Create the model
-    model = initialize_model()
+    # Create the model (see model.py for the variants and their cost)
+    model = initialize_model(input_shape, num_classes=y_train.shape[1], variant=model_variant, dropout=dropout)
 
     # Compile the model
-    model.compile(optimizer=Adam(learning_rate=0.0005), loss='categorical_crossentropy', metrics=['accuracy'])
+    model.compile(optimizer=Adam(learning_rate=learning_rate), loss='categorical_crossentropy', metrics=['accuracy'])
 
     # Define the callbacks
-    model_checkpoint = callbacks.ModelCheckpoint("model_best.keras", monitor='val_accuracy', save_best_only=True)
-    lr_reducer = callbacks.ReduceLROnPlateau(monitor='val_accuracy', factor=0.1, patience=3, min_lr=0.00001)
-    early_stopper = callbacks.EarlyStopping(monitor='val_accuracy', patience=10, restore_best_weights=True)
+    model_checkpoint = ModelCheckpoint(checkpoint_path, monitor='val_accuracy', save_best_only=True)
+    lr_reducer = ReduceLROnPlateau(monitor='val_accuracy', factor=0.1, patience=3, min_lr=0.00001)
+    early_stopper = EarlyStopping(monitor='val_accuracy', patience=10, restore_best_weights=True)
+    training_callbacks = [model_checkpoint, lr_reducer, early_stopper]
+    if instrumentation.ENABLED:
+        training_callbacks.append(EpochTimer())
 
     # Train the model
-    history = model.fit(X_augmented, y_augmented, validation_data=(X_val, y_val),
-                    epochs=100, batch_size=32,
-                    callbacks=[model_checkpoint, lr_reducer, early_stopper])
+    with stage("train"):
+        history = model.fit(train_dataset, steps_per_epoch=steps_per_epoch, validation_data=val_dataset,
+                        epochs=epochs,
+                        callbacks=training_callbacks, verbose=verbose)
     
     # Save the final model
-    model.save('musify_app.keras')
+    with stage("save_model"):
+        model.save(model_path)
     
     return history
 
 
 
 def main():
-    # deviding data to train val and test 
+    # deviding data to train val and test with a seeded manifest, without copying any audio
     parent_folder = "genres_original"
-    output_folder_name = "divided_files"
-    divide_data(parent_folder, output_folder_name)
+    manifest_path = "split_manifest.csv"
+    create_split_manifest(parent_folder, manifest_path, ratios=(0.7, 0.15, 0.15), seed=42)
 
-    # segmenting data into 3 seconds
-    segment_music_files('divided_files', 'segmented_3')
-
-    # extracting chroma, mel spectrogram and mfcc features, concatinate it together and save them 
+    # segmenting data into 3 seconds in memory and extracting chroma, mel spectrogram and mfcc features,
+    # concatinate it together and save them (pass segments_dir="segmented_3" to also keep the segment WAVs)
     extract_features_for_all_sets(
-        parent_dir="segmented_3",
-        output_dir="3_sec_features"
+        parent_dir=parent_folder,
+        output_dir="3_sec_features",
+        num_workers=os.cpu_count(),
+        cache_dir="feature_cache",
+        manifest_path=manifest_path
     )
 
+    # store the features as float16 shards, which halves their size on disk and in the page cache
+    convert_to_feature_store("3_sec_features", dtype="float16", remove_source=True)
+
     # load audio features 
     X_train, y_train, X_test, y_test, X_val, y_val = load_audio_features()
 
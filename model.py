@@ -1,31 +1,58 @@
+import argparse
+import time
 from tensorflow.keras.models import Sequential
 from tensorflow.keras import layers, optimizers, callbacks
 import numpy as np
 
+VARIANTS = ("baseline", "global_pool", "separable", "separable_small")
+
+def initialize_model(input_shape=(153, 259, 1), num_classes=10, variant="baseline", dropout=0.6):
+    """
+    Build the genre classifier.
+
+    Variants:
+        baseline: three Conv2D blocks, then Flatten into Dense(128). The flattened 20x33x256 feature map
+            makes that Dense layer hold most of the parameters and a large share of the compute.
+        global_pool: the baseline convolutions, with global average pooling instead of Flatten.
+        separable: depthwise-separable convolutions after the first block, and global average pooling.
+        separable_small: the separable variant with half the filters, for the smallest serving hosts.
+
+    Args:
+        input_shape (tuple): The shape of one input, (n_features, n_frames, 1).
+        num_classes (int): The number of genres.
+        variant (str): One of `VARIANTS`.
+        dropout (float): The dropout rate after the convolutions and before the output layer.
+
+    Returns:
+        The uncompiled Keras model.
+    """
+    if variant not in VARIANTS:
+        raise ValueError(f"Unknown model variant {variant!r}, expected one of {VARIANTS}")
+    separable = variant.startswith("separable")
+    filters = (32, 64, 128) if variant == "separable_small" else (64, 128, 256)
 
-
-def initialize_model():
     model = Sequential()
 
     # Input layer
-    model.add(layers.Input(shape=(153, 259, 1)))
-
-    # Convolutional layers with Batch Normalization and increased filters
-    model.add(layers.Conv2D(64, (3, 3), activation="relu", padding="same"))
-    model.add(layers.BatchNormalization())
-    model.add(layers.MaxPooling2D((2, 2), padding="same"))
-
-    model.add(layers.Conv2D(128, (3, 3), activation="relu", padding="same"))
-    model.add(layers.BatchNormalization())
-    model.add(layers.MaxPooling2D((2, 2), padding="same"))
-
-    model.add(layers.Conv2D(256, (3, 3), activation="relu", padding="same"))
-    model.add(layers.BatchNormalization())
-    model.add(layers.MaxPooling2D((2, 2), padding="same"))
-    model.add(layers.Dropout(0.6))
-
-    # Flatten the output of the conv layers to feed into the dense layers
-    model.add(layers.Flatten())
+    model.add(layers.Input(shape=input_shape))
+
+    # Convolutional layers with Batch Normalization and increased filters. The first block sees a single
+    # channel, where a depthwise-separable convolution saves nothing, so it is a regular convolution
+    for block, block_filters in enumerate(filters):
+        if separable and block > 0:
+            model.add(layers.SeparableConv2D(block_filters, (3, 3), activation="relu", padding="same"))
+        else:
+            model.add(layers.Conv2D(block_filters, (3, 3), activation="relu", padding="same"))
+        model.add(layers.BatchNormalization())
+        model.add(layers.MaxPooling2D((2, 2), padding="same"))
+    model.add(layers.Dropout(dropout))
+
+    if variant == "baseline":
+        # Flatten the output of the conv layers to feed into the dense layers
+        model.add(layers.Flatten())
+    else:
+        # Average every feature map over frequency and time
+        model.add(layers.GlobalAveragePooling2D())
 
     # Dense layers with Batch Normalization
     model.add(layers.Dense(128, activation="relu"))
@@ -34,13 +61,76 @@ def initialize_model():
 
     model.add(layers.Dense(256, activation="relu"))
     model.add(layers.BatchNormalization())
-    model.add(layers.Dropout(0.6))
+    model.add(layers.Dropout(dropout))
 
     # Output layer with the number of classes
-    num_classes = 10  # Update with the number of music genres you have
     model.add(layers.Dense(num_classes, activation="softmax"))
 
     return model
 
-
-
+def count_flops(model):
+    """
+    Count the floating point operations of one forward pass of a single sample.
+
+    Convolutions and dense layers are counted as two operations per multiply-add; normalization,
+    pooling and activations are negligible next to them and left out.
+    """
+    flops = 0
+    for layer in model.layers:
+        if isinstance(layer, layers.SeparableConv2D):
+            _, height, width, _ = layer.output.shape
+            kernel_h, kernel_w, in_channels, multiplier = layer.depthwise_kernel.shape
+            flops += 2 * height * width * in_channels * multiplier * (kernel_h * kernel_w + layer.filters)
+        elif isinstance(layer, layers.Conv2D):
+            _, height, width, _ = layer.output.shape
+            kernel_h, kernel_w, in_channels, out_channels = layer.kernel.shape
+            flops += 2 * height * width * kernel_h * kernel_w * in_channels * out_channels
+        elif isinstance(layer, layers.Dense):
+            flops += 2 * layer.kernel.shape[0] * layer.kernel.shape[1]
+    return int(flops)
+
+def measure_latency(model, batch_sizes=(1, 8, 32), repeats=10):
+    """
+    Measure the median CPU latency of one batch per batch size, in milliseconds.
+    """
+    latency_ms = {}
+    for batch_size in batch_sizes:
+        batch = np.random.default_rng(0).standard_normal((batch_size,) + tuple(model.input_shape[1:]), dtype=np.float32)
+        model.predict_on_batch(batch)  # warm up
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            model.predict_on_batch(batch)
+            timings.append((time.perf_counter() - start) * 1000)
+        latency_ms[batch_size] = float(np.median(timings))
+    return latency_ms
+
+def model_cost_report(variants=VARIANTS, input_shape=(153, 259, 1), num_classes=10, batch_sizes=(1, 8, 32), repeats=10):
+    """
+    Build every variant and report its parameter count, FLOPs per sample and CPU latency per batch size.
+
+    Returns:
+        dict: Per variant, "params", "flops" and "latency_ms" (keyed by batch size).
+    """
+    report = {}
+    for variant in variants:
+        model = initialize_model(input_shape, num_classes, variant)
+        report[variant] = {
+            "params": int(model.count_params()),
+            "flops": count_flops(model),
+            "latency_ms": measure_latency(model, batch_sizes, repeats),
+        }
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the cost of the model variants on this machine.")
+    parser.add_argument("--variants", nargs="+", default=list(VARIANTS), choices=VARIANTS)
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--repeats", type=int, default=10)
+    args = parser.parse_args()
+
+    report = model_cost_report(args.variants, batch_sizes=tuple(args.batch_sizes), repeats=args.repeats)
+    print(f"{'variant':<18}{'params':>12}{'MFLOPs':>10}" + "".join(f"{f'ms@{b}':>10}" for b in args.batch_sizes))
+    for variant, row in report.items():
+        print(f"{variant:<18}{row['params']:>12,}{row['flops'] / 1e6:>10.0f}"
+              + "".join(f"{row['latency_ms'][b]:>10.1f}" for b in args.batch_sizes))
@@ -0,0 +1,101 @@
+import os
+import gdown
+import numpy as np
+from keras.models import load_model
+from inference_backend import load_backend
+from checksums import file_sha256
+
+MODEL_URL = 'https://drive.google.com/uc?id=1-0ASTcK6MNWWgeKNfs9xqBcqx6ydQU49'
+MODEL_PATH = 'my_model.h5'
+# Pin the expected checksum of the published model, if known
+MODEL_SHA256 = os.environ.get('MUSIFY_MODEL_SHA256')
+# Serve a local .tflite/.onnx export instead of the published Keras model, if set
+MODEL_BACKEND = os.environ.get('MUSIFY_MODEL_BACKEND')
+
+def ensure_model_file(model_path=MODEL_PATH, url=MODEL_URL, sha256=MODEL_SHA256):
+    """
+    Make sure a verified copy of the model is on disk, downloading it only when it is missing or stale.
+
+    The checksum of every download is recorded next to the model (`<model_path>.sha256`). A local copy
+    is reused as long as it still matches the pinned checksum, or the recorded one when nothing is
+    pinned; a truncated or modified file is downloaded again.
+
+    Args:
+        model_path (str): The local path of the model file.
+        url (str): The URL the model is downloaded from.
+        sha256 (str, optional): The expected checksum of the model.
+
+    Returns:
+        str: The path of the verified model file.
+    """
+    checksum_path = f"{model_path}.sha256"
+    expected = sha256
+    if expected is None and os.path.exists(checksum_path):
+        with open(checksum_path) as f:
+            expected = f.read().strip()
+
+    if os.path.exists(model_path):
+        actual = file_sha256(model_path)
+        if expected is None or actual == expected:
+            if not os.path.exists(checksum_path):
+                _write_checksum(checksum_path, actual)
+            return model_path
+        print(f"{model_path} does not match its checksum, downloading it again")
+
+    # Download next to the target and only move it into place once verified
+    download_path = f"{model_path}.download"
+    gdown.download(url, download_path, quiet=False)
+    actual = file_sha256(download_path)
+    if sha256 is not None and actual != sha256:
+        os.remove(download_path)
+        raise ValueError(f"Downloaded model checksum {actual} does not match the expected {sha256}")
+    os.replace(download_path, model_path)
+    _write_checksum(checksum_path, actual)
+    return model_path
+
+def model_version(model_path=MODEL_PATH, backend_path=MODEL_BACKEND):
+    """
+    Identify the model being served by the checksum of its file, e.g. to key cached predictions.
+
+    Args:
+        model_path (str): The local path of the Keras model file.
+        backend_path (str, optional): The .tflite/.onnx export served instead, if any.
+
+    Returns:
+        str: The SHA-256 checksum of the served model file.
+    """
+    if backend_path:
+        return file_sha256(backend_path)
+    # ensure_model_file records the checksum of every verified model next to it
+    checksum_path = f"{model_path}.sha256"
+    if os.path.exists(checksum_path):
+        with open(checksum_path) as f:
+            return f.read().strip()
+    return file_sha256(model_path)
+
+def load_inference_model(model_path=MODEL_PATH, url=MODEL_URL, sha256=MODEL_SHA256, input_shape=(153, 259),
+                         backend_path=MODEL_BACKEND, num_threads=None):
+    """
+    Load the verified model and warm it up, so the first real request does not pay for graph tracing.
+
+    Args:
+        model_path (str): The local path of the model file.
+        url (str): The URL the model is downloaded from when needed.
+        sha256 (str, optional): The expected checksum of the model.
+        input_shape (tuple): The shape of a single model input, used for the dummy warm-up batch.
+        backend_path (str, optional): A local .tflite/.onnx export to serve instead of the Keras model.
+        num_threads (int, optional): The number of CPU threads of the .tflite/.onnx backend.
+
+    Returns:
+        The loaded model, or the inference backend wrapping the export.
+    """
+    if backend_path:
+        model = load_backend(backend_path, num_threads)
+    else:
+        model = load_model(ensure_model_file(model_path, url, sha256))
+    model.predict(np.zeros((1,) + input_shape, dtype=np.float32), verbose=0)
+    return model
+
+def _write_checksum(checksum_path, checksum):
+    with open(checksum_path, 'w') as f:
+        f.write(checksum + '\n')
@@ -1,64 +1,203 @@
 import os
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 from numpy_processing import load_and_process_audio, standardize_feature
+from feature_cache import DEFAULT_MAX_CACHE_BYTES, cached_load_and_process_audio, prune_feature_cache
 from sklearn.preprocessing import LabelEncoder
 from keras.utils import to_categorical
 from tqdm import tqdm
+import instrumentation
+from instrumentation import stage, count
 
-def extract_audio_features(data_dir, output_dir, max_bins=128):
+def extract_audio_features(data_dir, output_dir, max_bins=128, num_workers=1, cache_dir=None,
+                           max_cache_bytes=DEFAULT_MAX_CACHE_BYTES):
     """
     Extracts robust audio features from audio files in a directory with nested subfolders.
-    
+
+    Features are written straight into a preallocated, memory-mapped `{subset}_features.npy`,
+    one row per file in sorted order, so memory stays flat and the output is the same whichever
+    worker finishes first.
+
     Parameters:
     data_dir (str): The path to the directory containing the Train, Test, and Validation subdirectories.
     output_dir (str): The path to the directory where the features and labels will be saved.
     max_bins (int): The maximum number of frequency bins to consider.
-    
+    num_workers (int): The number of worker processes. 1 extracts in the current process.
+    cache_dir (str): Optional feature cache directory. Files whose content and parameters were
+        processed before are read from the cache instead of being re-extracted.
+    max_cache_bytes (int): The size limit of the feature cache; least recently used entries are evicted.
+
     Returns:
     None
     """
     os.makedirs(output_dir, exist_ok=True)
-    
+
     # Create a LabelEncoder object
     label_encoder = LabelEncoder()
-    
+
     # Iterate over Train, Test, and Validation subdirectories
     for subset in ['Train', 'Test', 'Validation']:
         subset_dir = os.path.join(data_dir, subset)
-        subset_data = []
-        subset_labels = []
-        
-        # Iterate over all genre subfolders
-        for genre_dir in os.listdir(subset_dir):
-            genre_label = genre_dir
-            subdirectory_path = os.path.join(subset_dir, genre_dir)
-
-            for filename in tqdm(os.listdir(subdirectory_path), desc=f"Processing files in {genre_dir}"):
-                filepath = os.path.join(subdirectory_path, filename)
-                try:
-                    features = load_and_process_audio(filepath, max_bins)
-                    
-                    if features.size > 0:
-                        subset_data.append(features)
-                        subset_labels.append(genre_label)
-                except UserWarning as e:
-                    if "Trying to estimate tuning from empty frequency set" in str(e):
-                        print(f"Error processing file {filename} in {genre_dir}: {e}")
-                        print(filepath)
-
-        # Convert data and labels to numpy arrays
-        subset_data_np = np.array(subset_data)
-        subset_labels_np = np.array(subset_labels)
-        
+        filepaths, genre_labels = list_audio_files(subset_dir)
+
+        save_path_features = os.path.join(output_dir, f"{subset}_features.npy")
+        save_path_labels = os.path.join(output_dir, f"{subset}_labels.npy")
+
+        # Preallocate the output with one row per file, sized from the first file, then fill it in place
+        first, first_features = probe_features(filepaths, max_bins, cache_dir)
+        feature_shape = first_features.shape if first is not None else (0, 0)
+        partial_path = os.path.join(output_dir, f"{subset}_features.partial.npy")
+        subset_data = np.lib.format.open_memmap(
+            partial_path, mode='w+', dtype=np.float32, shape=(len(filepaths),) + feature_shape
+        )
+        if first is not None:
+            subset_data[first] = first_features
+        del subset_data
+
+        # The probed file is already written and the files before it could not be processed
+        start = len(filepaths) if first is None else first + 1
+        tasks = [(index, filepaths[index], max_bins, cache_dir) for index in range(start, len(filepaths))]
+        if num_workers > 1:
+            with ProcessPoolExecutor(num_workers, initializer=_open_output, initargs=(partial_path,)) as executor:
+                results = list(tqdm(executor.map(_extract_into_output, tasks, chunksize=16),
+                                    total=len(tasks), desc=f"Processing files in {subset}"))
+        else:
+            _open_output(partial_path)
+            results = [_extract_into_output(task) for task in tqdm(tasks, desc=f"Processing files in {subset}")]
+        _close_output()
+        if cache_dir is not None:
+            prune_feature_cache(cache_dir, max_cache_bytes)
+
+        # Fold the metrics recorded in the worker processes into this one
+        for _, metrics in results:
+            instrumentation.merge(metrics)
+
+        # Drop the rows of files that could not be processed
+        succeeded = np.zeros(len(filepaths), dtype=bool)
+        succeeded[start:] = [ok for ok, _ in results]
+        if first is not None:
+            succeeded[first] = True
+        with stage("finalize_features"):
+            finalize_features(partial_path, save_path_features, succeeded)
+        subset_labels_np = np.array(genre_labels)[succeeded]
+
         # Encode string labels to numerical values
         subset_labels_encoded = label_encoder.fit_transform(subset_labels_np)
-        
+
         # Convert labels to categorical format
         num_classes = len(label_encoder.classes_)
         subset_labels_categorical = to_categorical(subset_labels_encoded, num_classes)
-        
-        # Save features and labels for the current subset
-        save_path_features = os.path.join(output_dir, f"{subset}_features.npy")
-        save_path_labels = os.path.join(output_dir, f"{subset}_labels.npy")
-        np.save(save_path_features, subset_data_np)
-        np.save(save_path_labels, subset_labels_categorical)
\ No newline at end of file
+
+        # Save labels for the current subset
+        np.save(save_path_labels, subset_labels_categorical)
+
+def list_audio_files(subset_dir):
+    """
+    List the audio files of a subset in a fixed (sorted) order.
+
+    Parameters:
+    subset_dir (str): The path to a directory with one subfolder per genre.
+
+    Returns:
+    tuple: The file paths and the genre label of each file.
+    """
+    filepaths = []
+    genre_labels = []
+    for genre_dir in sorted(os.listdir(subset_dir)):
+        subdirectory_path = os.path.join(subset_dir, genre_dir)
+        if not os.path.isdir(subdirectory_path):
+            continue
+        for filename in sorted(os.listdir(subdirectory_path)):
+            filepaths.append(os.path.join(subdirectory_path, filename))
+            genre_labels.append(genre_dir)
+    return filepaths, genre_labels
+
+def probe_features(filepaths, max_bins=128, cache_dir=None):
+    """
+    Extract the features of the first file that can be processed, which determine the per-file feature shape.
+
+    Parameters:
+    filepaths (list): The audio files of a subset.
+    max_bins (int): The maximum number of frequency bins to consider.
+    cache_dir (str): Optional feature cache directory.
+
+    Returns:
+    tuple: The index of that file and its features, e.g. of shape (153, 259), or (None, None) if no file
+        can be processed.
+    """
+    for index, filepath in enumerate(filepaths):
+        if cache_dir is not None:
+            features = cached_load_and_process_audio(filepath, max_bins, cache_dir)
+        else:
+            features = load_and_process_audio(filepath, max_bins)
+        if features.size > 0:
+            count("files_extracted")
+            return index, features
+        count("extraction_failures")
+    return None, None
+
+def finalize_features(partial_path, save_path, succeeded, chunk_size=256):
+    """
+    Move a preallocated feature file into place, compacting out the rows that failed.
+
+    Parameters:
+    partial_path (str): The preallocated .npy file the features were written into.
+    save_path (str): The final path of the features.
+    succeeded (numpy.ndarray): A boolean mask of the rows that hold valid features.
+    chunk_size (int): The number of rows copied at a time when compacting.
+    """
+    if succeeded.all():
+        os.replace(partial_path, save_path)
+        return
+
+    partial = np.load(partial_path, mmap_mode='r')
+    valid_rows = np.flatnonzero(succeeded)
+    compacted = np.lib.format.open_memmap(
+        save_path, mode='w+', dtype=partial.dtype, shape=(len(valid_rows),) + partial.shape[1:]
+    )
+    for start in range(0, len(valid_rows), chunk_size):
+        compacted[start:start + chunk_size] = partial[valid_rows[start:start + chunk_size]]
+    compacted.flush()
+    del partial, compacted
+    os.remove(partial_path)
+
+# Memory-mapped output of the current process, opened once per worker
+_output = None
+
+def _open_output(path):
+    global _output
+    _output = np.load(path, mmap_mode='r+')
+
+def _close_output():
+    global _output
+    if _output is not None:
+        _output.flush()
+    _output = None
+
+def _write_output(start, rows):
+    _output[start:start + len(rows)] = rows
+
+def _extract_into_output(task):
+    index, filepath, max_bins, cache_dir = task
+    with stage("extract_file"):
+        succeeded = _extract_file(index, filepath, max_bins, cache_dir)
+    count("files_extracted" if succeeded else "extraction_failures")
+    return succeeded, instrumentation.collect()
+
+def _extract_file(index, filepath, max_bins, cache_dir):
+    try:
+        if cache_dir is not None:
+            features = cached_load_and_process_audio(filepath, max_bins, cache_dir)
+        else:
+            features = load_and_process_audio(filepath, max_bins)
+
+        if features.size > 0:
+            if features.shape != _output.shape[1:]:
+                print(f"Skipping {filepath}: features have shape {features.shape}, expected {_output.shape[1:]}")
+                return False
+            _output[index] = features
+            return True
+    except Exception as e:
+        # e.g. librosa's "Trying to estimate tuning from empty frequency set" on silent files
+        print(f"Error processing file {filepath}: {e}")
+    return False
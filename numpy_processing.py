@@ -1,5 +1,11 @@
 import librosa
 import numpy as np
+from instrumentation import stage, count
+
+# Feature extraction parameters shared by training and inference
+SAMPLE_RATE = 44100 # sampling rate every input is decoded at
+N_FFT = 2048 # FFT window size
+HOP_LENGTH = 512 # number of samples between successive frames
 
 def load_and_process_audio(file_path, max_bins=128):
     """
@@ -13,48 +19,73 @@ def load_and_process_audio(file_path, max_bins=128):
     numpy.ndarray: The concatenated features (mel_db, chroma, mfcc).
     """
     try:
-        # Load audio file with a consistent sampling rate
-        y, sr = librosa.load(file_path, sr=44100)
-        
-        # Define parameters for consistency
-        n_fft = 2048 # FFT window size
-        hop_length = 512 # number of samples between successive frames
+        # Load audio file with a consistent sampling rate (decoded and resampled separately, as librosa.load does)
+        with stage("decode"):
+            y, sr = librosa.load(file_path, sr=None)
+        with stage("resample"):
+            y = librosa.resample(y, orig_sr=sr, target_sr=SAMPLE_RATE, res_type="soxr_hq")
+        count("files_decoded")
         
-        # Extract Mel-Spectrogram
+        return process_audio(y, SAMPLE_RATE, max_bins)
+    except Exception as e:
+        print(f"Error processing {file_path}: {e}")
+        count("decode_failures")
+        return np.array([])
+
+def process_audio(y, sr=SAMPLE_RATE, max_bins=128):
+    """
+    Extract mel-spectrogram, chroma, and MFCC features from an already decoded audio signal.
+    
+    Parameters:
+    y (numpy.ndarray): The mono audio signal.
+    sr (int): The sampling rate of the signal.
+    max_bins (int): The maximum number of frequency bins to consider.
+    
+    Returns:
+    numpy.ndarray: The concatenated features (mel_db, chroma, mfcc).
+    """
+    # Define parameters for consistency
+    n_fft = N_FFT
+    hop_length = HOP_LENGTH
+    
+    # Extract Mel-Spectrogram
+    with stage("mel"):
         mel = librosa.feature.melspectrogram(y=y, sr=sr, n_fft=n_fft, hop_length=hop_length, n_mels=max_bins)
         mel_db = librosa.power_to_db(mel, ref=np.max)
-        
-        # Extract Chroma Feature
+    
+    # Extract Chroma Feature
+    with stage("chroma"):
         chroma = librosa.feature.chroma_stft(y=y, sr=sr, n_fft=n_fft, hop_length=hop_length)
-        
-        # Extract MFCC
+    
+    # Extract MFCC
+    with stage("mfcc"):
         mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13, n_fft=n_fft, hop_length=hop_length)
-        
-        # Standardize features
+    
+    # Standardize features
+    with stage("standardize"):
         mel_db_std = standardize_feature(mel_db)
         chroma_std = standardize_feature(chroma)
         mfcc_std = standardize_feature(mfcc)
-        
-        # Concatenate features along axis=0 (vertically)
-        features = np.concatenate((mel_db_std, chroma_std, mfcc_std), axis=0)
-        
-        return features
-    except Exception as e:
-        print(f"Error processing {file_path}: {e}")
-        return np.array([])
+    count("segments_featurized")
+    
+    # Concatenate features along axis=0 (vertically)
+    features = np.concatenate((mel_db_std, chroma_std, mfcc_std), axis=0)
+    
+    return features
 
 def standardize_feature(feature):
     """
     Standardize a feature by subtracting the mean and dividing by the standard deviation.
+    Statistics are taken along the last (time) axis, so a stack of windows is standardized per window.
     
     Parameters:
-    feature (numpy.ndarray): The feature to be standardized.
+    feature (numpy.ndarray): The feature to be standardized, shaped (..., n_bins, n_frames).
     
     Returns:
     numpy.ndarray: The standardized feature.
     """
-    feature_mean = np.mean(feature, axis=1, keepdims=True)
-    feature_std = np.std(feature, axis=1, keepdims=True)
+    feature_mean = np.mean(feature, axis=-1, keepdims=True)
+    feature_std = np.std(feature, axis=-1, keepdims=True)
     feature_std[feature_std == 0] = 1  # Avoid division by zero
     feature_std = (feature - feature_mean) / feature_std
     return feature_std
\ No newline at end of file
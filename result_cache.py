@@ -0,0 +1,167 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs, urlparse
+from instrumentation import count
+
+DEFAULT_RESULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "musify", "results")
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600 # one week
+
+_VIDEO_ID = re.compile(r"^[A-Za-z0-9_-]{11}$")
+
+def youtube_video_id(url):
+    """
+    Extract the video ID from the common YouTube URL forms (watch?v=, youtu.be/, /shorts/, /embed/, /live/),
+    so the same video shared through different links maps to the same cache entry.
+
+    Returns:
+    str: The 11-character video ID, or None if the URL is not recognized.
+    """
+    parsed = urlparse(url.strip() if "://" in url else f"https://{url.strip()}")
+    host = (parsed.hostname or "").lower()
+    candidate = None
+    if host == "youtu.be":
+        candidate = parsed.path.lstrip("/").split("/")[0]
+    elif host.endswith("youtube.com") or host.endswith("youtube-nocookie.com"):
+        if parsed.path == "/watch":
+            candidate = parse_qs(parsed.query).get("v", [None])[0]
+        else:
+            parts = parsed.path.strip("/").split("/")
+            if len(parts) >= 2 and parts[0] in ("shorts", "embed", "live", "v"):
+                candidate = parts[1]
+    return candidate if candidate and _VIDEO_ID.match(candidate) else None
+
+class ResultCache:
+    """
+    Two-tier cache of classification results: an in-memory LRU in front of a persistent directory of
+    JSON entries. Entries expire `ttl_seconds` after they were computed, in both tiers.
+
+    Keys include the model version, so results of a previous model are never served after an update.
+    Thread safe, since Streamlit serves every session from its own thread.
+    """
+
+    def __init__(self, model_version, cache_dir=DEFAULT_RESULT_CACHE_DIR, max_entries=1024,
+                 ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.model_version = model_version
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def upload_key(self, data):
+        """
+        The cache key of an uploaded file, from its content.
+        """
+        return self._key("upload", hashlib.sha256(data).hexdigest())
+
+    def youtube_key(self, url):
+        """
+        The cache key of a YouTube URL, from its video ID (the stripped URL if it has none).
+        """
+        return self._key("youtube", youtube_video_id(url) or url.strip())
+
+    def get(self, key):
+        """
+        Return the cached result for a key, or None on a miss.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry["created"] < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                count("result_cache_memory_hits")
+                return entry["result"]
+            self._entries.pop(key, None)
+
+        entry = self._read_entry(key)
+        if entry is not None and now - entry["created"] < self.ttl_seconds:
+            self._remember(key, entry)
+            with self._lock:
+                self.disk_hits += 1
+            count("result_cache_disk_hits")
+            return entry["result"]
+
+        with self._lock:
+            self.misses += 1
+        count("result_cache_misses")
+        return None
+
+    def put(self, key, result):
+        """
+        Store a JSON-serializable result under a key, in memory and on disk.
+        """
+        entry = {"created": time.time(), "result": result}
+        self._remember(key, entry)
+        self._write_entry(key, entry)
+
+    def stats(self):
+        """
+        The hit and miss counts since the cache was created.
+        """
+        with self._lock:
+            return {"memory_hits": self.memory_hits, "disk_hits": self.disk_hits, "misses": self.misses,
+                    "entries_in_memory": len(self._entries)}
+
+    def prune(self):
+        """
+        Delete the expired entries of the disk tier.
+
+        Returns:
+        int: The number of deleted entries.
+        """
+        deleted = 0
+        cutoff = time.time() - self.ttl_seconds
+        for root, dirs, files in os.walk(self.cache_dir):
+            for filename in files:
+                entry_path = os.path.join(root, filename)
+                # Entries are never modified after they are written, so their mtime is their creation time
+                if filename.endswith(".json") and os.path.getmtime(entry_path) < cutoff:
+                    try:
+                        os.remove(entry_path)
+                        deleted += 1
+                    except FileNotFoundError:
+                        pass
+        return deleted
+
+    def _key(self, kind, identifier):
+        return hashlib.sha256(f"{self.model_version}:{kind}:{identifier}".encode()).hexdigest()
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _read_entry(self, key):
+        try:
+            with open(self._entry_path(key)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_entry(self, key, entry):
+        # Written to a temporary file and renamed into place, so readers never see a partial entry
+        entry_path = self._entry_path(key)
+        try:
+            os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(entry_path), suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(entry, f)
+            os.replace(temp_path, entry_path)
+        except OSError as e:
+            # A read-only or full disk only costs the persistent tier, the result is still served
+            print(f"Could not persist result cache entry {key}: {e}")
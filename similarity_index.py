@@ -0,0 +1,263 @@
+import argparse
+import json
+import os
+import numpy as np
+from tqdm import tqdm
+from inference import GENRES
+from classify_library import find_tracks, featurize_tracks
+
+EMBEDDINGS_FILE = "embeddings.npy"
+IDS_FILE = "ids.json"
+IVF_FILE = "ivf.npz"
+
+def embedding_model(model):
+    """
+    Wrap a trained Keras classifier so one forward pass returns both the genre probabilities and the
+    output of its penultimate Dense(256) layer, the segment embedding.
+    """
+    from keras import Model, layers
+    dense_layers = [layer for layer in model.layers if isinstance(layer, layers.Dense)]
+    return Model(inputs=model.inputs, outputs=[model.outputs[0], dense_layers[-2].output])
+
+def pool_embeddings(segment_embeddings):
+    """
+    Mean-pool the segment embeddings of a track and L2-normalize the result, so a dot product
+    between two track embeddings is their cosine similarity.
+    """
+    track_embedding = np.mean(segment_embeddings, axis=0, dtype=np.float32)
+    norm = np.linalg.norm(track_embedding)
+    return track_embedding / norm if norm > 0 else track_embedding
+
+def build_index(library_dir, model, index_dir, decode_workers=4, batch_size=256, n_lists=None):
+    """
+    Embed every track of a library and write the similarity index.
+
+    The index is a contiguous float32 matrix of L2-normalized track embeddings (`embeddings.npy`) and
+    an ID map (`ids.json`) with the path and predicted genre of every row. With `n_lists`, an inverted
+    file (`ivf.npz`) is built as well, for approximate search over large catalogs.
+
+    Args:
+        library_dir (str): The root directory of the music library.
+        model: The trained Keras model.
+        index_dir (str): The directory to write the index to.
+        decode_workers (int): The number of decoding processes.
+        batch_size (int): The number of segments per forward pass.
+        n_lists (int, optional): The number of IVF clusters, e.g. about sqrt(number of tracks).
+
+    Returns:
+        int: The number of indexed tracks.
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    model = embedding_model(model)
+    ids = []
+    embeddings = []
+    ready = []
+
+    def flush_ready():
+        batch = np.concatenate([features for _, features in ready])
+        probabilities, segment_embeddings = model.predict(batch, batch_size=batch_size, verbose=0)
+        offset = 0
+        for path, features in ready:
+            track = slice(offset, offset + len(features))
+            offset += len(features)
+            genre_probabilities = np.mean(probabilities[track], axis=0)
+            ids.append({"path": path, "genre": GENRES[int(np.argmax(genre_probabilities))]})
+            embeddings.append(pool_embeddings(segment_embeddings[track]))
+        ready.clear()
+
+    tracks = find_tracks(library_dir)
+    for path, features, error in tqdm(featurize_tracks(tracks, decode_workers), total=len(tracks),
+                                      desc="Embedding tracks", unit="track"):
+        if error is not None:
+            print(f"Error processing {path}: {error}")
+            continue
+        ready.append((path, features))
+        if sum(len(features) for _, features in ready) >= batch_size:
+            flush_ready()
+    if ready:
+        flush_ready()
+
+    embeddings = np.stack(embeddings) if embeddings else np.zeros((0, model.outputs[1].shape[-1]), dtype=np.float32)
+    if n_lists and len(embeddings) == 0:
+        # Nothing to cluster; the empty index still answers queries, with no results
+        print(f"No track of {library_dir} could be embedded, skipping the IVF lists")
+        n_lists = None
+    if n_lists:
+        # Store the rows grouped by cluster, so every IVF list is a contiguous slice
+        centroids, assignments = spherical_kmeans(embeddings, n_lists)
+        order = np.argsort(assignments, kind='stable')
+        embeddings, ids = embeddings[order], [ids[i] for i in order]
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(assignments, minlength=len(centroids)))))
+        np.savez(os.path.join(index_dir, IVF_FILE), centroids=centroids, offsets=offsets)
+    elif os.path.exists(os.path.join(index_dir, IVF_FILE)):
+        os.remove(os.path.join(index_dir, IVF_FILE))
+
+    np.save(os.path.join(index_dir, EMBEDDINGS_FILE), np.ascontiguousarray(embeddings, dtype=np.float32))
+    with open(os.path.join(index_dir, IDS_FILE), 'w') as f:
+        json.dump(ids, f)
+    return len(ids)
+
+def spherical_kmeans(embeddings, n_lists, iterations=10, sample_size=100000, seed=0):
+    """
+    Cluster unit vectors by cosine similarity, training on a sample and assigning every row.
+
+    Returns:
+        tuple: The (n_lists, dim) unit centroids and the cluster of every row.
+    """
+    rng = np.random.default_rng(seed)
+    n_lists = max(1, min(n_lists, len(embeddings)))
+    sample = embeddings[rng.choice(len(embeddings), size=min(sample_size, len(embeddings)), replace=False)]
+    centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(sample @ centroids.T, axis=1)
+        for cluster in range(n_lists):
+            members = sample[assignments == cluster]
+            if len(members) > 0:
+                centroid = members.sum(axis=0)
+                centroids[cluster] = centroid / max(np.linalg.norm(centroid), 1e-12)
+    return centroids, np.argmax(embeddings @ centroids.T, axis=1)
+
+class SimilarityIndex:
+    """
+    Top-k cosine similarity search over the track embeddings written by `build_index`.
+
+    Exact search scans the memory-mapped embedding matrix in blocks, one matrix product per block,
+    so memory stays bounded however large the catalog is. Approximate search only scans the
+    `n_probe` IVF lists whose centroids are closest to the query.
+    """
+
+    def __init__(self, index_dir, block_size=65536):
+        self.embeddings = np.load(os.path.join(index_dir, EMBEDDINGS_FILE), mmap_mode='r')
+        with open(os.path.join(index_dir, IDS_FILE)) as f:
+            self.ids = json.load(f)
+        self.rows = {entry["path"]: row for row, entry in enumerate(self.ids)}
+        self.block_size = block_size
+        self.centroids = self.offsets = None
+        ivf_path = os.path.join(index_dir, IVF_FILE)
+        if os.path.exists(ivf_path):
+            with np.load(ivf_path) as ivf:
+                self.centroids, self.offsets = ivf["centroids"], ivf["offsets"]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, queries, k=10, approximate=False, n_probe=8):
+        """
+        Find the k most similar tracks of every query embedding.
+
+        Args:
+            queries (numpy.ndarray): One (dim,) query or a (n_queries, dim) batch; normalized here.
+            k (int): The number of results per query.
+            approximate (bool): Only scan the IVF lists nearest to each query (needs an index built with `n_lists`).
+            n_probe (int): The number of IVF lists scanned per query in approximate mode.
+
+        Returns:
+            tuple: The (n_queries, k) row indices and cosine similarities, best first.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        k = min(k, len(self))
+        if k == 0:
+            return np.zeros((len(queries), 0), dtype=np.int64), np.zeros((len(queries), 0), dtype=np.float32)
+        if approximate:
+            if self.centroids is None:
+                raise ValueError("This index has no IVF lists; rebuild it with n_lists for approximate search")
+            return self._search_ivf(queries, k, n_probe)
+        return self._search_rows(queries, k, 0, len(self))
+
+    def query(self, embedding, k=10, approximate=False, n_probe=8, exclude=None):
+        """
+        Return the k most similar tracks of one query embedding as (track, similarity) pairs.
+
+        Args:
+            exclude (str, optional): A track path to leave out of the results, e.g. the query track itself.
+        """
+        rows, scores = self.search(embedding, k + (exclude is not None), approximate, n_probe)
+        # Approximate search pads with -inf when the probed lists hold fewer than k tracks
+        results = [(self.ids[row], float(score)) for row, score in zip(rows[0], scores[0])
+                   if np.isfinite(score) and self.ids[row]["path"] != exclude]
+        return results[:k]
+
+    def query_track(self, path, k=10, approximate=False, n_probe=8):
+        """
+        Return the k tracks most similar to an indexed track, leaving the track itself out.
+        """
+        return self.query(self.embeddings[self.rows[path]], k, approximate, n_probe, exclude=path)
+
+    def _search_rows(self, queries, k, start, stop, row_ids=None):
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        best_scores = np.zeros((len(queries), 0), dtype=np.float32)
+        for block_start in range(start, stop, self.block_size):
+            block_stop = min(block_start + self.block_size, stop)
+            scores = queries @ np.asarray(self.embeddings[block_start:block_stop]).T
+            rows = np.broadcast_to(np.arange(block_start, block_stop), scores.shape)
+            # Keep only the k best of the running results and this block
+            best_scores = np.concatenate((best_scores, scores), axis=1)
+            best_rows = np.concatenate((best_rows, rows), axis=1)
+            if best_scores.shape[1] > k:
+                top = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_scores = np.take_along_axis(best_scores, top, axis=1)
+                best_rows = np.take_along_axis(best_rows, top, axis=1)
+        order = np.argsort(-best_scores, axis=1)
+        return np.take_along_axis(best_rows, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+    def _search_ivf(self, queries, k, n_probe):
+        n_probe = min(n_probe, len(self.centroids))
+        probes = np.argpartition(-(queries @ self.centroids.T), n_probe - 1, axis=1)[:, :n_probe]
+        all_rows = np.zeros((len(queries), k), dtype=np.int64)
+        all_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        for i, query in enumerate(queries):
+            rows, scores = [], []
+            for cluster in probes[i]:
+                cluster_rows, cluster_scores = self._search_rows(query[None], k, self.offsets[cluster],
+                                                                 self.offsets[cluster + 1])
+                rows.append(cluster_rows[0])
+                scores.append(cluster_scores[0])
+            rows, scores = np.concatenate(rows), np.concatenate(scores)
+            top = np.argsort(-scores)[:k]
+            all_rows[i, :len(top)], all_scores[i, :len(top)] = rows[top], scores[top]
+        return all_rows, all_scores
+
+def embed_track(model, source):
+    """
+    Compute the pooled embedding of an audio file that is not in the index.
+    """
+    from inference import prepare_batch
+    _, segment_embeddings = embedding_model(model).predict(prepare_batch(source), verbose=0)
+    return pool_embeddings(segment_embeddings)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build and query a similar-tracks index of a music library.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build_parser = subparsers.add_parser("build", help="Embed every track of a library")
+    build_parser.add_argument("library_dir")
+    build_parser.add_argument("--model", default="musify_app.keras")
+    build_parser.add_argument("--index-dir", default="similarity_index")
+    build_parser.add_argument("--decode-workers", type=int, default=os.cpu_count())
+    build_parser.add_argument("--batch-size", type=int, default=256)
+    build_parser.add_argument("--n-lists", type=int, help="Build IVF lists for approximate search")
+    query_parser = subparsers.add_parser("query", help="Find the tracks most similar to a track")
+    query_parser.add_argument("track", help="An indexed track, or any audio file (then --model is needed)")
+    query_parser.add_argument("--model", default="musify_app.keras")
+    query_parser.add_argument("--index-dir", default="similarity_index")
+    query_parser.add_argument("-k", type=int, default=10)
+    query_parser.add_argument("--approximate", action="store_true")
+    query_parser.add_argument("--n-probe", type=int, default=8)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        # Imported here so the spawned decode workers never load TensorFlow
+        from keras.models import load_model
+        n_tracks = build_index(args.library_dir, load_model(args.model), args.index_dir, args.decode_workers,
+                               args.batch_size, args.n_lists)
+        print(f"Indexed {n_tracks} tracks in {args.index_dir}")
+    else:
+        index = SimilarityIndex(args.index_dir)
+        if args.track in index.rows:
+            results = index.query_track(args.track, args.k, args.approximate, args.n_probe)
+        else:
+            from keras.models import load_model
+            results = index.query(embed_track(load_model(args.model), args.track), args.k, args.approximate,
+                                  args.n_probe)
+        for entry, similarity in results:
+            print(f"{similarity:.3f}  {entry['genre']:<10} {entry['path']}")
@@ -0,0 +1,287 @@
+import argparse
+import csv
+import os
+import random
+import shutil
+from checksums import file_sha256
+
+SUBSETS = ['Train', 'Validation', 'Test']
+MANIFEST_FIELDS = ['path', 'genre', 'subset', 'sha256', 'size', 'mtime_ns', 'split']
+
+def scan_dataset(parent_folder, extensions=('.wav',), known=None):
+    """
+    List every audio file of a dataset with one subfolder per genre, with its content hash.
+
+    Args:
+        parent_folder (str): The path to the dataset, e.g. "genres_original".
+        extensions (tuple): The file extensions to include.
+        known (list, optional): The records of a previous scan (e.g. `read_manifest`); files whose size
+            and modification time are unchanged keep their recorded hash instead of being read again.
+
+    Returns:
+        list: One {"path", "genre", "sha256", "size", "mtime_ns"} record per file, sorted by genre and file name.
+    """
+    known = {os.path.normpath(os.path.abspath(record["path"])): record for record in known or []}
+    records = []
+    for genre in sorted(os.listdir(parent_folder)):
+        genre_folder = os.path.join(parent_folder, genre)
+        if not os.path.isdir(genre_folder):
+            continue
+        for filename in sorted(os.listdir(genre_folder)):
+            if filename.lower().endswith(extensions):
+                path = os.path.join(genre_folder, filename)
+                stat = os.stat(path)
+                record = {"path": path, "genre": genre, "size": str(stat.st_size), "mtime_ns": str(stat.st_mtime_ns)}
+                previous = known.get(os.path.normpath(os.path.abspath(path)))
+                if previous is not None and _unchanged(previous, record):
+                    record["sha256"] = previous["sha256"]
+                else:
+                    record["sha256"] = file_sha256(path)
+                records.append(record)
+    return records
+
+def split_records(records, ratios=(0.7, 0.15, 0.15), seed=42):
+    """
+    Assign every record to Train, Validation or Test, stratified by genre.
+
+    The split only depends on the seed and the set of files, not on listing order. Files with
+    identical content are kept in the same subset, so a duplicated track cannot leak from Train into Test.
+
+    Args:
+        records (list): The records from `scan_dataset` (or `read_manifest`).
+        ratios (tuple): The Train and Validation fractions per genre; Test gets the remainder.
+        seed (int): The seed of the shuffle.
+
+    Returns:
+        list: The records, each with its "subset".
+    """
+    rows = []
+    for genre, groups in _group_by_genre(records, seed).items():
+        train_count = int(ratios[0] * len(groups))
+        val_count = int(ratios[1] * len(groups))
+        for index, group in enumerate(groups):
+            if index < train_count:
+                subset = 'Train'
+            elif index < train_count + val_count:
+                subset = 'Validation'
+            else:
+                subset = 'Test'
+            rows.extend(dict(record, subset=subset) for record in group)
+    return _sorted_rows(rows)
+
+def kfold_records(records, k=5, fold=0, val_ratio=0.15, seed=42):
+    """
+    Assign every record to a subset for one fold of a stratified k-fold split.
+
+    Per genre, the files are shuffled once with the seed and cut into `k` folds. Fold `fold` is the
+    Test set, and `val_ratio` of the remaining files is held out as the Validation set.
+
+    Args:
+        records (list): The records from `scan_dataset` (or `read_manifest`).
+        k (int): The number of folds.
+        fold (int): The fold used as the Test set, from 0 to k - 1.
+        val_ratio (float): The fraction of each genre held out for validation.
+        seed (int): The seed of the shuffle, shared by all folds.
+
+    Returns:
+        list: The records, each with its "subset".
+    """
+    if not 0 <= fold < k:
+        raise ValueError(f"fold must be between 0 and {k - 1}, got {fold}")
+    rows = []
+    for genre, groups in _group_by_genre(records, seed).items():
+        test = [group for index, group in enumerate(groups) if index % k == fold]
+        rest = [group for index, group in enumerate(groups) if index % k != fold]
+        val_count = int(val_ratio * len(groups))
+        for subset, subset_groups in [('Validation', rest[:val_count]), ('Train', rest[val_count:]), ('Test', test)]:
+            rows.extend(dict(record, subset=subset) for group in subset_groups for record in group)
+    return _sorted_rows(rows)
+
+def write_manifest(rows, manifest_path):
+    """
+    Write a split manifest as CSV. Paths are stored relative to the manifest, so the dataset and its
+    manifest can be moved together.
+    """
+    manifest_dir = os.path.dirname(os.path.abspath(manifest_path))
+    with open(manifest_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=MANIFEST_FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(dict(row, path=os.path.relpath(os.path.abspath(row["path"]), manifest_dir)))
+
+def read_manifest(manifest_path):
+    """
+    Read a split manifest written by `write_manifest`.
+
+    Returns:
+        list: One {"path", "genre", "subset", "sha256"} record per file, with the paths resolved.
+    """
+    manifest_dir = os.path.dirname(os.path.abspath(manifest_path))
+    with open(manifest_path, newline='') as f:
+        return [dict(row, path=os.path.normpath(os.path.join(manifest_dir, row["path"]))) for row in csv.DictReader(f)]
+
+def manifest_subset(rows, subset):
+    """
+    The files of one subset in a fixed (sorted) order, like `numpy_extraction.list_audio_files`.
+
+    Args:
+        rows (list): The records of a manifest.
+        subset (str): "Train", "Validation" or "Test".
+
+    Returns:
+        tuple: The file paths and the genre label of each file.
+    """
+    subset_rows = [row for row in _sorted_rows(rows) if row["subset"] == subset]
+    return [row["path"] for row in subset_rows], [row["genre"] for row in subset_rows]
+
+def create_split_manifest(parent_folder, manifest_path, ratios=(0.7, 0.15, 0.15), seed=42, k=None, fold=0):
+    """
+    Scan a dataset and write or update its split manifest.
+
+    The dataset is scanned on every call, but only new or modified files are hashed again. When the
+    manifest was written with the same split parameters, the recorded files keep their subset: new
+    files join the subset of an identical recorded file, or else the subset furthest below its target
+    share of the genre, and files that no longer exist are dropped. Other parameters re-split every file.
+
+    Args:
+        parent_folder (str): The path to the dataset with one subfolder per genre.
+        manifest_path (str): The CSV file to write.
+        ratios (tuple): The Train and Validation fractions (ignored for k-fold splits).
+        seed (int): The seed of the split.
+        k (int, optional): Split into `k` folds and use fold `fold` as the Test set.
+        fold (int): The Test fold of a k-fold split.
+
+    Returns:
+        list: The records of the manifest.
+    """
+    previous = read_manifest(manifest_path) if os.path.exists(manifest_path) else []
+    records = scan_dataset(parent_folder, known=previous)
+
+    if k is None:
+        split = f"ratios={ratios[0]},{ratios[1]};seed={seed}"
+        targets = {'Train': ratios[0], 'Validation': ratios[1], 'Test': 1 - ratios[0] - ratios[1]}
+    else:
+        split = f"kfold={k};fold={fold};val_ratio={ratios[1]};seed={seed}"
+        targets = {'Train': 1 - 1 / k - ratios[1], 'Validation': ratios[1], 'Test': 1 / k}
+
+    recorded = {os.path.normpath(os.path.abspath(row["path"])): row for row in previous if row.get("split") == split}
+    kept, new = [], []
+    for record in records:
+        row = recorded.get(os.path.normpath(os.path.abspath(record["path"])))
+        if row is not None and _unchanged(row, record) and row["sha256"] == record["sha256"]:
+            kept.append(dict(record, subset=row["subset"]))
+        else:
+            new.append(record)
+
+    if not kept:
+        rows = split_records(records, ratios, seed) if k is None else kfold_records(records, k, fold, ratios[1], seed)
+    else:
+        rows = kept + _assign_new_records(kept, new, targets, seed)
+    rows = _sorted_rows([dict(row, split=split) for row in rows])
+    write_manifest(rows, manifest_path)
+    return rows
+
+def materialize_split(rows, output_folder, link='hardlink'):
+    """
+    Lay a manifest out as Train/Validation/Test genre folders, for tools that expect a directory tree.
+
+    Files of the subset folders that are not part of `rows` are deleted, so the folder can be
+    re-materialized after a new split.
+
+    Args:
+        rows (list): The records of a manifest.
+        output_folder (str): The folder to create the subsets in.
+        link (str): "hardlink" (falls back to a copy across file systems), "symlink" or "copy".
+    """
+    if link not in ('hardlink', 'symlink', 'copy'):
+        raise ValueError(f"Unknown link mode {link!r}")
+
+    # Remove the files of an earlier split first, so a track that moved to another subset is not left in both
+    expected = {os.path.join(output_folder, row["subset"], row["genre"], os.path.basename(row["path"])) for row in rows}
+    for subset in SUBSETS:
+        subset_folder = os.path.join(output_folder, subset)
+        if not os.path.isdir(subset_folder):
+            continue
+        for genre in os.listdir(subset_folder):
+            genre_folder = os.path.join(subset_folder, genre)
+            if not os.path.isdir(genre_folder):
+                continue
+            for filename in os.listdir(genre_folder):
+                path = os.path.join(genre_folder, filename)
+                if path not in expected:
+                    os.remove(path)
+
+    for row in rows:
+        dst_folder = os.path.join(output_folder, row["subset"], row["genre"])
+        os.makedirs(dst_folder, exist_ok=True)
+        dst_file = os.path.join(dst_folder, os.path.basename(row["path"]))
+        if os.path.lexists(dst_file):
+            os.remove(dst_file)
+        if link == 'symlink':
+            os.symlink(os.path.abspath(row["path"]), dst_file)
+            continue
+        if link == 'hardlink':
+            try:
+                os.link(row["path"], dst_file)
+                continue
+            except OSError:
+                pass
+        shutil.copy(row["path"], dst_file)
+
+def _group_by_genre(records, seed):
+    # Shuffle the distinct contents of each genre, with a random stream of its own per genre
+    groups_by_genre = {}
+    for record in sorted(records, key=lambda record: (record["genre"], record["path"])):
+        groups_by_genre.setdefault(record["genre"], {}).setdefault(record["sha256"], []).append(record)
+
+    shuffled = {}
+    for genre, groups in groups_by_genre.items():
+        ordered = [groups[sha256] for sha256 in sorted(groups)]
+        random.Random(f"{seed}:{genre}").shuffle(ordered)
+        shuffled[genre] = ordered
+    return shuffled
+
+def _assign_new_records(rows, records, targets, seed):
+    # Keep identical contents together, then fill the subset of the genre furthest below its target share
+    subset_of_hash = {row["sha256"]: row["subset"] for row in rows}
+    counts = {}
+    for row in rows:
+        genre_counts = counts.setdefault(row["genre"], dict.fromkeys(SUBSETS, 0))
+        genre_counts[row["subset"]] += 1
+
+    assigned = []
+    for genre, groups in _group_by_genre(records, seed).items():
+        genre_counts = counts.setdefault(genre, dict.fromkeys(SUBSETS, 0))
+        for group in groups:
+            subset = subset_of_hash.get(group[0]["sha256"])
+            if subset is None:
+                total = sum(genre_counts.values()) + len(group)
+                subset = max(SUBSETS, key=lambda name: targets[name] * total - genre_counts[name])
+                subset_of_hash[group[0]["sha256"]] = subset
+            genre_counts[subset] += len(group)
+            assigned.extend(dict(record, subset=subset) for record in group)
+    return assigned
+
+def _unchanged(previous, record):
+    return previous.get("size") == record["size"] and previous.get("mtime_ns") == record["mtime_ns"]
+
+def _sorted_rows(rows):
+    return sorted(rows, key=lambda row: (row["genre"], os.path.basename(row["path"]), row["path"]))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a seeded Train/Validation/Test split manifest of a dataset.")
+    parser.add_argument("parent_folder", help="The dataset, with one subfolder per genre")
+    parser.add_argument("--manifest", default="split_manifest.csv")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--ratios", nargs=2, type=float, default=[0.7, 0.15], metavar=("TRAIN", "VALIDATION"))
+    parser.add_argument("--kfold", type=int, help="Split into this many folds")
+    parser.add_argument("--fold", type=int, default=0, help="The fold used as the Test set")
+    parser.add_argument("--materialize", help="Also lay the split out as folders here")
+    parser.add_argument("--link", default="hardlink", choices=["hardlink", "symlink", "copy"])
+    args = parser.parse_args()
+
+    rows = create_split_manifest(args.parent_folder, args.manifest, tuple(args.ratios), args.seed, args.kfold, args.fold)
+    for subset in SUBSETS:
+        print(f"{subset}: {sum(row['subset'] == subset for row in rows)} files")
+    if args.materialize:
+        materialize_split(rows, args.materialize, args.link)
@@ -0,0 +1,50 @@
+import math
+import numpy as np
+import tensorflow as tf
+from data_augmentation import augment_batch
+
+def make_augmented_dataset(X_train, y_train, batch_size=32, num_augmented_samples=8000, seed=None,
+                           num_parallel_calls=tf.data.AUTOTUNE):
+    """
+    Build an endless tf.data pipeline that augments training batches on the fly.
+
+    Every batch mixes original samples with freshly augmented ones (scaling, noise, time shifting,
+    masking and mixup), in the same proportion as `augment_data` would produce, but nothing is
+    materialized: batches are generated on tf.data worker threads and prefetched, so memory stays
+    constant however many augmented samples per epoch are requested.
+
+    Parameters:
+    X_train (numpy.ndarray): The training features. A memory-mapped array works as well.
+    y_train (numpy.ndarray): The one-hot training labels.
+    batch_size (int): The number of samples per batch.
+    num_augmented_samples (int): The number of augmented samples per epoch.
+    seed (int): Seed for reproducible augmentation. Every batch still gets its own random stream.
+    num_parallel_calls (int): The number of batches generated in parallel.
+
+    Returns:
+    tuple: The dataset and the number of steps per epoch to pass to `model.fit`.
+    """
+    n_samples = len(X_train)
+    steps_per_epoch = math.ceil((n_samples + num_augmented_samples) / batch_size)
+    augment_probability = num_augmented_samples / (n_samples + num_augmented_samples)
+    entropy = np.random.SeedSequence(seed).entropy
+
+    def make_batch(step):
+        # An independent generator per batch keeps parallel workers reproducible and thread safe
+        rng = np.random.default_rng([entropy, int(step)])
+        n_augmented = rng.binomial(batch_size, augment_probability)
+        X_augmented, y_augmented = augment_batch(X_train, y_train, n_augmented, rng)
+
+        idx = np.sort(rng.integers(0, n_samples, batch_size - n_augmented))
+        X_batch = np.concatenate((X_train[idx], X_augmented)).astype(np.float32)
+        y_batch = np.concatenate((y_train[idx], y_augmented)).astype(np.float32)
+        return X_batch, y_batch
+
+    def generate(step):
+        X_batch, y_batch = tf.numpy_function(make_batch, [step], (tf.float32, tf.float32))
+        X_batch.set_shape((batch_size,) + X_train.shape[1:])
+        y_batch.set_shape((batch_size,) + y_train.shape[1:])
+        return X_batch, y_batch
+
+    dataset = tf.data.Dataset.counter().map(generate, num_parallel_calls=num_parallel_calls, deterministic=seed is not None)
+    return dataset.prefetch(tf.data.AUTOTUNE), steps_per_epoch
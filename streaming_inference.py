@@ -0,0 +1,121 @@
+import numpy as np
+import soundfile as sf
+import soxr
+from numpy_processing import SAMPLE_RATE
+from feature_engine import extract_segment_features
+from inference import GENRES
+from audio_ingest import decode_stream
+from three_seconds_segmentation import split_into_segments
+from instrumentation import stage
+
+def decode_blocks(stream, sr=SAMPLE_RATE, block_seconds=1.0):
+    """
+    Decode an audio byte stream incrementally into mono PCM blocks at the feature sampling rate.
+
+    Blocks are read and resampled as the stream is consumed, so only one block is in memory at a time.
+    Formats libsndfile cannot stream (e.g. YouTube's mp4/webm audio) and byte chunks that are still
+    arriving are decoded by ffmpeg while they arrive (see `audio_ingest.decode_stream`).
+
+    Parameters:
+    stream (file-like or iterable): A readable binary stream, or an iterable of byte chunks such as a
+        download in progress.
+    sr (int): The target sampling rate.
+    block_seconds (float): The duration of the decoded blocks.
+
+    Yields:
+    numpy.ndarray: Consecutive float32 mono blocks at `sr`.
+    """
+    if not hasattr(stream, "read"):
+        yield from decode_stream(stream, sr, block_seconds)
+        return
+
+    start = stream.tell() if stream.seekable() else None
+    try:
+        sound_file = sf.SoundFile(stream)
+    except Exception:
+        if start is not None:
+            stream.seek(start)
+        yield from decode_stream(stream, sr, block_seconds)
+        return
+
+    with sound_file:
+        resampler = None
+        if sound_file.samplerate != sr:
+            resampler = soxr.ResampleStream(sound_file.samplerate, sr, 1, dtype='float32')
+
+        blocksize = max(1, int(block_seconds * sound_file.samplerate))
+        blocks = sound_file.blocks(blocksize=blocksize, dtype='float32', always_2d=True)
+        while True:
+            with stage("decode"):
+                block = next(blocks, None)
+            if block is None:
+                break
+            # Downmix to mono like librosa.load does
+            block = block.mean(axis=1)
+            if resampler:
+                with stage("resample"):
+                    block = resampler.resample_chunk(block)
+            yield block
+        if resampler:
+            yield resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True)
+
+def stream_predictions(model, stream, max_bins=128, segment_duration=3, segments_per_update=4):
+    """
+    Classify an audio stream while it decodes, yielding the running genre distribution.
+
+    Full segments are featurized and predicted as soon as `segments_per_update` of them have been
+    decoded. Only the not yet complete segment is buffered, so memory stays bounded however long the
+    track is.
+
+    The segments arrive in track order, so every one of them is used: stopping on a confident prefix
+    would judge the whole track by its start. Use `inference.classify_anytime` to stop early on
+    segments spread across the track, when the whole audio is available.
+
+    Parameters:
+    model: The trained model (anything with a Keras-compatible `predict`).
+    stream (file-like or iterable): A readable binary stream, or an iterable of byte chunks.
+    max_bins (int): The maximum number of frequency bins to consider.
+    segment_duration (int): The duration of each audio segment in seconds.
+    segments_per_update (int): The number of segments predicted between two updates.
+
+    Yields:
+    dict: The current "genre", the mean "probabilities" per genre and the number of "segments" so far.
+    """
+    segment_samples = int(segment_duration * SAMPLE_RATE)
+    pending = np.zeros(0, dtype=np.float32)
+    genre_probabilities = None
+    segments_used = 0
+
+    def update(segments):
+        nonlocal genre_probabilities, segments_used
+        features = extract_segment_features(segments, SAMPLE_RATE, max_bins)
+        with stage("predict"):
+            predictions = model.predict(features, verbose=0)
+
+        # Calculate the cumulative probabilities for each genre
+        batch_probabilities = np.sum(predictions, axis=0)
+        genre_probabilities = batch_probabilities if genre_probabilities is None else genre_probabilities + batch_probabilities
+        segments_used += len(segments)
+        mean_probabilities = genre_probabilities / segments_used
+        return {
+            "genre": GENRES[int(np.argmax(genre_probabilities))],
+            "probabilities": {GENRES[i]: float(p) for i, p in enumerate(mean_probabilities)},
+            "segments": segments_used,
+        }
+
+    for block in decode_blocks(stream):
+        pending = np.concatenate((pending, block))
+        if len(pending) < segments_per_update * segment_samples:
+            continue
+
+        # Predict every full segment and keep the remainder for the next block
+        segments = split_into_segments(pending, SAMPLE_RATE, segment_duration)
+        for start in range(0, len(segments), segments_per_update):
+            yield update(segments[start:start + segments_per_update])
+        pending = pending[len(segments) * segment_samples:].copy()
+
+    segments = split_into_segments(pending, SAMPLE_RATE, segment_duration)
+    if len(segments) > 0:
+        yield update(segments)
+    elif segments_used == 0:
+        raise ValueError(f"Audio is shorter than one {segment_duration}-second segment")
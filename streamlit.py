@@ -1,19 +1,18 @@
-import os
-import tempfile
-import numpy as np
-import soundfile as sf
-import librosa
+import time
 import streamlit as st
-from keras.models import load_model
-from numpy_processing import load_and_process_audio
-from three_seconds_segmentation import segment_music_files
-from pytube import YouTube
+import numpy as np
+from inference import GENRES, classify_anytime
+from streaming_inference import stream_predictions
+from model_provider import load_inference_model, model_version
+from result_cache import ResultCache
+from job_executor import JobExecutor, QueueFull, THREADS_PER_JOB
+from pytube import YouTube, request
 from io import BytesIO
-import gdown
+import instrumentation
+from instrumentation import stage, count, observe
 
 model_path = 'my_model.h5'
 url = 'https://drive.google.com/uc?id=1-0ASTcK6MNWWgeKNfs9xqBcqx6ydQU49'
-output = gdown.download(url, model_path, quiet=False)
 
 
 
@@ -62,30 +61,85 @@ genre_info = {
     "rock": "Rock music is a genre that emerged in the 1950s and has since evolved into various subgenres. It typically features electric guitars and strong rhythms."
 }
 
-# Load the trained model
-model = load_model('model_path')
-
-# Define the genre labels
-GENRES = {
-    0: "Blues",
-    1: "Classical",
-    2: "Country",
-    3: "Disco",
-    4: "Hiphop",
-    5: "Jazz",
-    6: "Metal",
-    7: "Pop",
-    8: "Reggae",
-    9: "Rock"
-}
-
-def download_audio_to_buffer(url):
-    buffer = BytesIO()
-    youtube_video = YouTube(url)
-    audio = youtube_video.streams.get_audio_only()
-    audio.stream_to_buffer(buffer)
-    buffer.seek(0)
-    return buffer
+# Load the trained model once per process; Streamlit reruns this script on every interaction
+@st.cache_resource
+def get_model():
+    return load_inference_model(model_path, url, num_threads=THREADS_PER_JOB)
+
+model = get_model()
+
+# Classification results, keyed by upload content or YouTube video ID and the model version
+@st.cache_resource
+def get_result_cache():
+    result_cache = ResultCache(model_version(model_path))
+    result_cache.prune()
+    return result_cache
+
+result_cache = get_result_cache()
+
+# One bounded pool runs the classification work of every session, so a burst of users queues up
+# instead of every session thread competing for the CPU
+@st.cache_resource
+def get_job_executor():
+    return JobExecutor()
+
+job_executor = get_job_executor()
+
+def download_audio_chunks(url):
+    # Yield the audio stream chunk by chunk, so decoding starts while the rest is still downloading.
+    # Only the time spent waiting for YouTube counts as download time, not the time the consumer takes
+    waited = 0.0
+    try:
+        start = time.perf_counter()
+        audio = YouTube(url).streams.get_audio_only()
+        chunks = request.stream(audio.url)
+        waited += time.perf_counter() - start
+        while True:
+            start = time.perf_counter()
+            chunk = next(chunks, None)
+            waited += time.perf_counter() - start
+            if chunk is None:
+                break
+            count("bytes_downloaded", len(chunk))
+            yield chunk
+    finally:
+        observe("download", waited)
+
+def classification_job(job, source):
+    def report(result):
+        job.progress = result
+
+    if isinstance(source, BytesIO):
+        # A whole upload: evaluate segments spread across the track, and stop once the prediction is confident
+        genre_probabilities, segments_used, _ = classify_anytime(model, source, confidence=0.25, progress=report)
+        return GENRES[int(np.argmax(genre_probabilities))], segments_used
+
+    # A download in progress: predict every segment as it decodes (it raises on audio without a full segment)
+    for result in stream_predictions(model, source):
+        report(result)
+        if job.cancelled:
+            break
+    return result["genre"], result["segments"]
+
+def classify_audio(source):
+    # Show the queue position, then the running prediction while the audio is being classified
+    job = job_executor.submit(classification_job, source)
+    status = st.empty()
+    try:
+        while not job.wait(timeout=0.25):
+            position = job.position()
+            if position:
+                status.write(f"Waiting for a free worker ({position} in line)...")
+            elif job.progress is not None:
+                status.write(f"Listening... **{job.progress['genre']}** so far ({job.progress['segments']} segments)")
+    finally:
+        # The session was closed or rerun before the job finished
+        if not job.done():
+            job.cancel()
+    status.empty()
+
+    # The most likely genre over every segment used
+    return job.result()
 
 with tab1:
     st.markdown("<h1 style='text-align: center; font-size: 1.5em;color: black;margin-top:-15px;'>Musify</h1>", unsafe_allow_html=True)
@@ -100,47 +154,30 @@ with tab1:
         uploaded_file = st.file_uploader("Upload a music file for genre classification:")
 
         if uploaded_file is not None:
-            # Save the uploaded file to a temporary location
-            with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-                temp_file_path = temp_file.name
-                temp_file.write(uploaded_file.getvalue())
-
-            # Create a temporary directory for segmentation
-            temp_dir = "temp_segments"
-            os.makedirs(temp_dir, exist_ok=True)
-
-            # Segment the uploaded file into 3-second chunks
-            segment_music_files(temp_file_path, temp_dir, segment_duration=3)
-
-            # Extract features from the audio segments
-            audio_features = []
-            for filename in os.listdir(temp_dir):
-                if filename.endswith('.wav'):
-                    file_path = os.path.join(temp_dir, filename)
-                    features = load_and_process_audio(file_path)
-                    if features.size > 0:
-                        audio_features.append(features)
-
-            audio_features_np = np.array(audio_features)
-
-            # Make predictions
-            predictions = model.predict(audio_features_np)
-
-            # Calculate the cumulative probabilities for each genre
-            genre_probabilities = np.sum(predictions, axis=0)
-
-            # Determine the most likely genre
-            most_likely_genre_index = np.argmax(genre_probabilities)
-            most_likely_genre = GENRES[most_likely_genre_index]
+            try:
+                count("requests")
+                count("bytes_uploaded", uploaded_file.size)
+                with stage("request"):
+                    data = uploaded_file.getvalue()
+                    cache_key = result_cache.upload_key(data)
+                    cached = result_cache.get(cache_key)
+                    if cached is None:
+                        most_likely_genre, segments_used = classify_audio(BytesIO(data))
+                        result_cache.put(cache_key, {"genre": most_likely_genre, "segments": segments_used})
+                    else:
+                        most_likely_genre, segments_used = cached["genre"], cached["segments"]
 
-            st.write(f"# Predicted Genre: {most_likely_genre}")
-            st.markdown(genre_info[most_likely_genre.lower()])
-            st.audio(uploaded_file)
+                st.write(f"# Predicted Genre: {most_likely_genre}")
+                st.caption(f"Based on {segments_used} three-second segments")
+                st.markdown(genre_info[most_likely_genre.lower()])
+                st.audio(uploaded_file)
 
-            # Remove the temporary file and directory
-            os.remove(temp_file_path)
-            import shutil
-            shutil.rmtree(temp_dir)
+            except QueueFull:
+                st.warning("The app is busy right now, please try again in a minute.")
+            except Exception as e:
+                count("request_failures")
+                st.error(f"Error processing uploaded file: {e}")
+            instrumentation.write_snapshot()
 
     elif choice == "Enter a YouTube URL":
         # YouTube URL input
@@ -149,54 +186,30 @@ with tab1:
         if youtube_url:
             # Download the audio from the YouTube video
             try:
-                buffer = download_audio_to_buffer(youtube_url)
-
-                # Create a temporary directory for segmentation
-                temp_dir = "temp_segments"
-                os.makedirs(temp_dir, exist_ok=True)
-
-                # Save buffer to a temporary file
-                temp_file_path = os.path.join(temp_dir, "temp_audio.mp3")
-                with open(temp_file_path, "wb") as f:
-                    f.write(buffer.getbuffer())
-
-                # Segment the downloaded audio into 3-second chunks
-                segment_music_files(temp_file_path, temp_dir, segment_duration=3)
-
-                # Extract features from the audio segments
-                audio_features = []
-                for filename in os.listdir(temp_dir):
-                    if filename.endswith('.wav'):
-                        file_path = os.path.join(temp_dir, filename)
-                        features = load_and_process_audio(file_path)
-                        if features.size > 0:
-                            audio_features.append(features)
-
-                audio_features_np = np.array(audio_features)
-
-                # Make predictions
-                predictions = model.predict(audio_features_np)
-
-                # Calculate the cumulative probabilities for each genre
-                genre_probabilities = np.sum(predictions, axis=0)
-
-                # Determine the most likely genre
-                most_likely_genre_index = np.argmax(genre_probabilities)
-                most_likely_genre = GENRES[most_likely_genre_index]
+                count("requests")
+                with stage("request"):
+                    # A cached video is neither downloaded nor decoded again
+                    cache_key = result_cache.youtube_key(youtube_url)
+                    cached = result_cache.get(cache_key)
+                    if cached is None:
+                        most_likely_genre, segments_used = classify_audio(download_audio_chunks(youtube_url))
+                        result_cache.put(cache_key, {"genre": most_likely_genre, "segments": segments_used})
+                    else:
+                        most_likely_genre, segments_used = cached["genre"], cached["segments"]
 
                 st.write(f"# Predicted Genre: {most_likely_genre}")
+                st.caption(f"Based on {segments_used} three-second segments")
                 st.markdown(genre_info[most_likely_genre.lower()])
 
                 # Embed the YouTube video player using st.video
                 st.video(youtube_url)
 
-                # Remove the temporary file and directory
-                os.remove(temp_file_path)
-                import shutil
-                shutil.rmtree(temp_dir)
-
+            except QueueFull:
+                st.warning("The app is busy right now, please try again in a minute.")
             except Exception as e:
+                count("request_failures")
                 st.error(f"Error processing YouTube URL: {e}")
+            instrumentation.write_snapshot()
 
 with tab2:
     st.markdown("""
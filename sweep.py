@@ -0,0 +1,156 @@
+import argparse
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+RESULT_FIELDS = ['trial', 'model_variant', 'learning_rate', 'batch_size', 'dropout', 'num_augmented_samples',
+                 'epochs', 'best_val_accuracy', 'best_epoch', 'epochs_run', 'test_accuracy', 'seconds', 'status', 'error',
+                 'config']
+# train_model arguments the sweep sets itself for every trial
+RESERVED_KEYS = {'X_train', 'y_train', 'X_val', 'y_val', 'model_path', 'checkpoint_path', 'verbose'}
+
+def expand_grid(grid):
+    """
+    Expand a {parameter: [values]} grid into one `train_model` configuration per combination.
+    """
+    names = sorted(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+def run_sweep(configs, features_dir='3_sec_features', output_dir='sweep_results', workers=None, threads_per_trial=None):
+    """
+    Train one model per configuration, several trials at a time, each in its own process.
+
+    Every worker process gets `threads_per_trial` TensorFlow/BLAS threads and, when the machine has
+    enough cores, its own set of CPU cores, so concurrent trials do not oversubscribe the CPU. The
+    trials memory-map the same feature files, so the data is held once in the page cache however
+    many trials read it. Results are appended to `<output_dir>/results.csv` as trials finish, with the
+    full configuration of every trial as JSON in the "config" column. Trial numbers continue after
+    the rows already in the file, so a new sweep never overwrites the models of an earlier one.
+
+    Args:
+        configs (list): The `main.train_model` keyword arguments of every trial, e.g. from `expand_grid`.
+        features_dir (str): The extracted features (.npy files or feature stores).
+        output_dir (str): Where the results table and the model of every trial are written.
+        workers (int): The number of concurrent trials; defaults to one per 4 cores.
+        threads_per_trial (int): The number of threads per trial; defaults to an even share of the cores.
+
+    Returns:
+        list: The result row of every trial.
+    """
+    for config in configs:
+        reserved = RESERVED_KEYS.intersection(config)
+        if reserved:
+            raise ValueError(f"The sweep sets {sorted(reserved)} itself; remove them from the configuration")
+    os.makedirs(output_dir, exist_ok=True)
+    cores = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else list(range(os.cpu_count()))
+    workers = workers or max(1, len(cores) // 4)
+    threads_per_trial = threads_per_trial or max(1, len(cores) // workers)
+
+    # Give every worker process its own slice of the cores, when there are enough of them
+    context = multiprocessing.get_context('spawn')
+    core_sets = context.Queue()
+    for slot in range(workers):
+        slot_cores = cores[slot * threads_per_trial:(slot + 1) * threads_per_trial]
+        core_sets.put(slot_cores if workers * threads_per_trial <= len(cores) else None)
+
+    results_path = os.path.join(output_dir, 'results.csv')
+    write_header = not os.path.exists(results_path)
+    first_trial = 0
+    if not write_header:
+        with open(results_path, newline='') as f:
+            first_trial = max((int(row['trial']) + 1 for row in csv.DictReader(f)), default=0)
+    results = []
+    with open(results_path, 'a', newline='') as f, \
+            ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker,
+                                initargs=(core_sets, threads_per_trial)) as executor:
+        writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+        if write_header:
+            writer.writeheader()
+
+        futures = [executor.submit(_run_trial, trial, config, features_dir, output_dir)
+                   for trial, config in enumerate(configs, start=first_trial)]
+        for future in as_completed(futures):
+            row = future.result()
+            writer.writerow(row)
+            f.flush()
+            results.append(row)
+            print(f"Trial {row['trial']} {row['status']}: val_accuracy={row['best_val_accuracy']} "
+                  f"in {row['seconds']:.0f} s ({row['config']})")
+    return sorted(results, key=lambda row: row['trial'])
+
+def _init_worker(core_sets, threads):
+    # Runs before TensorFlow or numpy are imported in the worker, so the thread settings take effect
+    for variable in ['OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'TF_NUM_INTRAOP_THREADS']:
+        os.environ[variable] = str(threads)
+    os.environ['TF_NUM_INTEROP_THREADS'] = '1'
+    os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+    cores = core_sets.get()
+    if cores:
+        os.sched_setaffinity(0, cores)
+
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+def _run_trial(trial, config, features_dir, output_dir):
+    from main import load_audio_features, train_model
+    from feature_dataset import make_feature_dataset
+    from keras.models import load_model
+
+    config = dict(config)
+    row = {field: config.get(field) for field in RESULT_FIELDS}
+    row.update(trial=trial, status='ok', error='', config=json.dumps(config, sort_keys=True))
+    start = time.perf_counter()
+    try:
+        # Memory-mapped, so every trial shares the same pages instead of holding its own copy
+        X_train, y_train, X_test, y_test, X_val, y_val = load_audio_features(features_dir)
+        model_path = os.path.join(output_dir, f"trial_{trial}.keras")
+        history = train_model(X_train, y_train, X_val, y_val, model_path=model_path,
+                              checkpoint_path=os.path.join(output_dir, f"trial_{trial}_best.keras"), verbose=0,
+                              **config)
+
+        val_accuracy = history.history['val_accuracy']
+        best_epoch = max(range(len(val_accuracy)), key=val_accuracy.__getitem__)
+        model = load_model(model_path)
+        _, test_accuracy = model.evaluate(make_feature_dataset(X_test, y_test, batch_size=config.get('batch_size', 32)),
+                                          verbose=0)
+        row.update(best_val_accuracy=round(float(val_accuracy[best_epoch]), 4), best_epoch=best_epoch + 1,
+                   epochs_run=len(val_accuracy), test_accuracy=round(float(test_accuracy), 4))
+    except Exception as e:
+        row.update(status='failed', error=f"{type(e).__name__}: {e}")
+    row['seconds'] = round(time.perf_counter() - start, 1)
+    return row
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a parallel hyperparameter sweep over main.train_model.")
+    parser.add_argument("--features-dir", default="3_sec_features")
+    parser.add_argument("--output-dir", default="sweep_results")
+    parser.add_argument("--workers", type=int, help="Concurrent trials (default: one per 4 cores)")
+    parser.add_argument("--threads-per-trial", type=int)
+    parser.add_argument("--grid", help="A JSON file mapping train_model arguments to lists of values")
+    parser.add_argument("--learning-rate", nargs="+", type=float, default=[0.0005])
+    parser.add_argument("--batch-size", nargs="+", type=int, default=[32])
+    parser.add_argument("--dropout", nargs="+", type=float, default=[0.6])
+    parser.add_argument("--augmented", nargs="+", type=int, default=[8000], help="Augmented samples per epoch")
+    parser.add_argument("--variant", nargs="+", default=["baseline"])
+    parser.add_argument("--epochs", type=int, default=100)
+    args = parser.parse_args()
+
+    if args.grid:
+        with open(args.grid) as f:
+            grid = json.load(f)
+    else:
+        grid = {"learning_rate": args.learning_rate, "batch_size": args.batch_size, "dropout": args.dropout,
+                "num_augmented_samples": args.augmented, "model_variant": args.variant, "epochs": [args.epochs]}
+
+    configs = expand_grid(grid)
+    results = run_sweep(configs, args.features_dir, args.output_dir, args.workers, args.threads_per_trial)
+    print(f"{'trial':<7}{'val_acc':>9}{'test_acc':>10}{'seconds':>9}  config")
+    for row in sorted(results, key=lambda row: row['best_val_accuracy'] or 0, reverse=True):
+        config = json.loads(row['config'])
+        print(f"{row['trial']:<7}{str(row['best_val_accuracy']):>9}{str(row['test_accuracy']):>10}"
+              f"{row['seconds']:>9.0f}  {config}")
@@ -0,0 +1,111 @@
+import io
+import threading
+import numpy as np
+import pytest
+import soundfile as sf
+import audio_ingest
+from audio_ingest import iter_chunks, decode_audio, decode_stream, ffmpeg_blocks
+from streaming_inference import decode_blocks
+
+requires_ffmpeg = pytest.mark.skipif(audio_ingest.FFMPEG is None, reason="ffmpeg is not installed")
+
+SR = 44100
+
+def stereo_signal(seconds, sr=SR):
+    t = np.arange(int(seconds * sr)) / sr
+    return np.stack([0.5 * np.sin(2 * np.pi * 440 * t), 0.3 * np.sin(2 * np.pi * 660 * t)], axis=1)
+
+def wav_bytes(seconds, sr=SR, format="WAV"):
+    buffer = io.BytesIO()
+    sf.write(buffer, stereo_signal(seconds, sr), sr, format=format, subtype="PCM_16")
+    return buffer.getvalue()
+
+def chunked(data, chunk_size=4096):
+    for start in range(0, len(data), chunk_size):
+        yield data[start:start + chunk_size]
+
+def test_iter_chunks():
+    data = bytes(range(256)) * 10
+    assert list(iter_chunks(data)) == [data]
+    assert list(iter_chunks(memoryview(data))) == [data]
+    assert list(iter_chunks(io.BytesIO(data), chunk_size=1000)) == [data[:1000], data[1000:2000], data[2000:]]
+    assert list(iter_chunks([b"ab", b"", b"cd"])) == [b"ab", b"cd"]
+    assert list(iter_chunks(io.BytesIO(b""))) == []
+
+@pytest.fixture
+def no_ffmpeg(monkeypatch):
+    monkeypatch.setattr(audio_ingest, "FFMPEG", None)
+
+def fail_ffmpeg(*args, **kwargs):
+    raise AssertionError("ffmpeg must not be used")
+
+@pytest.mark.parametrize("format", ["WAV", "FLAC"])
+def test_soundfile_decodes_from_memory(format, monkeypatch):
+    monkeypatch.setattr(audio_ingest, "ffmpeg_blocks", fail_ffmpeg)
+    data = wav_bytes(2, format=format)
+    expected = stereo_signal(2).mean(axis=1)
+    for source in (data, io.BytesIO(data), chunked(data)):
+        y = decode_audio(source, sr=SR)
+        assert y.dtype == np.float32 and y.shape == expected.shape
+        assert np.allclose(y, expected, atol=1e-3)
+
+@pytest.mark.parametrize("format", ["WAV", "FLAC"])
+def test_tempfile_fallback_without_ffmpeg(format, no_ffmpeg, monkeypatch):
+    # Stand in for a container libsndfile cannot read from memory: only paths can be loaded
+    load = audio_ingest.librosa.load
+    paths = []
+
+    def load_paths_only(source, **kwargs):
+        if not isinstance(source, str):
+            raise ValueError("unsupported container")
+        paths.append(source)
+        return load(source, **kwargs)
+
+    monkeypatch.setattr(audio_ingest.librosa, "load", load_paths_only)
+    y = decode_audio(chunked(wav_bytes(2, format=format)), sr=SR)
+    assert len(paths) == 1
+    assert np.allclose(y, stereo_signal(2).mean(axis=1), atol=1e-3)
+
+def test_decode_stream_without_ffmpeg_yields_one_block(no_ffmpeg):
+    blocks = list(decode_stream(chunked(wav_bytes(2)), sr=SR, block_seconds=0.5))
+    assert len(blocks) == 1 and len(blocks[0]) == 2 * SR
+
+def test_ffmpeg_blocks_requires_ffmpeg(no_ffmpeg):
+    with pytest.raises(RuntimeError, match="MUSIFY_FFMPEG"):
+        next(ffmpeg_blocks(wav_bytes(1)))
+
+@requires_ffmpeg
+def test_chunk_iterable_matches_whole_decode():
+    data = wav_bytes(5)
+    streamed = np.concatenate(list(decode_blocks(chunked(data), sr=SR, block_seconds=0.5)))
+    whole = decode_audio(data, sr=SR)
+    assert streamed.shape == whole.shape
+    assert np.allclose(streamed, whole, atol=1e-4)
+
+@requires_ffmpeg
+def test_closing_the_generator_kills_ffmpeg(monkeypatch):
+    processes = []
+    popen = audio_ingest.subprocess.Popen
+
+    def recording_popen(*args, **kwargs):
+        processes.append(popen(*args, **kwargs))
+        return processes[-1]
+
+    monkeypatch.setattr(audio_ingest.subprocess, "Popen", recording_popen)
+
+    # The source stalls after its first half, like a download in progress, so ffmpeg is still running
+    data = wav_bytes(20)
+    release = threading.Event()
+
+    def stalling_source():
+        yield data[:len(data) // 2]
+        release.wait(timeout=30)
+        yield data[len(data) // 2:]
+
+    blocks = ffmpeg_blocks(stalling_source(), sr=SR, block_seconds=0.5)
+    assert len(next(blocks)) > 0
+    blocks.close()
+    release.set()
+
+    assert processes[0].poll() is not None
+    assert processes[0].stdout.closed
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+from data_augmentation import augment_data, augment_batch
+
+@pytest.fixture
+def training_data():
+    rng = np.random.default_rng(0)
+    X = rng.standard_normal((12, 20, 30)).astype(np.float32)
+    y = np.eye(4, dtype=np.float32)[rng.integers(0, 4, 12)]
+    return X, y
+
+def test_same_seed_gives_identical_output(training_data):
+    X, y = training_data
+    first = augment_data(X, y, num_augmented_samples=50, batch_size=16, seed=7)
+    second = augment_data(X, y, num_augmented_samples=50, batch_size=16, seed=7)
+    other = augment_data(X, y, num_augmented_samples=50, batch_size=16, seed=8)
+    np.testing.assert_array_equal(first[0], second[0])
+    np.testing.assert_array_equal(first[1], second[1])
+    assert not np.array_equal(first[0], other[0])
+
+def test_originals_are_kept_first_and_unchanged(training_data):
+    X, y = training_data
+    X_before, y_before = X.copy(), y.copy()
+    X_augmented, y_augmented = augment_data(X, y, num_augmented_samples=50, batch_size=16, seed=0)
+    np.testing.assert_array_equal(X_augmented[:len(X)], X)
+    np.testing.assert_array_equal(y_augmented[:len(y)], y)
+    np.testing.assert_array_equal(X, X_before)
+    np.testing.assert_array_equal(y, y_before)
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+def test_shape_and_dtype(training_data, dtype):
+    X, y = training_data
+    # 50 is not a multiple of the batch size, so the last block is partial
+    X_augmented, y_augmented = augment_data(X.astype(dtype), y.astype(dtype), num_augmented_samples=50,
+                                            batch_size=16, seed=0)
+    assert X_augmented.shape == (62, 20, 30) and X_augmented.dtype == dtype
+    assert y_augmented.shape == (62, 4) and y_augmented.dtype == dtype
+    assert np.isfinite(X_augmented).all()
+
+def test_augmented_batch_is_normalized_with_valid_labels(training_data):
+    X, y = training_data
+    samples, labels = augment_batch(X, y, 32, np.random.default_rng(0))
+    assert samples.shape == (32, 20, 30) and labels.shape == (32, 4)
+    np.testing.assert_allclose(samples.mean(axis=(1, 2)), 0, atol=1e-5)
+    np.testing.assert_allclose(samples.std(axis=(1, 2)), 1, rtol=1e-4)
+    # Mixup blends two one-hot labels, so every label is still a distribution over the genres
+    np.testing.assert_allclose(labels.sum(axis=1), 1, rtol=1e-6)
+    assert (labels >= 0).all()
@@ -0,0 +1,69 @@
+import os
+import numpy as np
+import feature_cache
+from feature_cache import (feature_cache_key, load_cached_features, store_cached_features, prune_feature_cache,
+                           cached_load_and_process_audio)
+
+def test_key_follows_contents_and_parameters(tmp_path):
+    audio = tmp_path / "a.wav"
+    audio.write_bytes(b"first contents")
+    key = feature_cache_key(str(audio), max_bins=128)
+
+    copy = tmp_path / "renamed.wav"
+    copy.write_bytes(b"first contents")
+    assert feature_cache_key(str(copy), max_bins=128) == key
+    assert feature_cache_key(str(audio), max_bins=64) != key
+    assert feature_cache_key(str(audio), max_bins=128, segment_duration=3) != key
+
+    audio.write_bytes(b"other contents")
+    assert feature_cache_key(str(audio), max_bins=128) != key
+
+def test_store_and_load_round_trip(tmp_path):
+    features = np.random.default_rng(0).random((153, 259), dtype=np.float32)
+    assert load_cached_features("ab" * 32, str(tmp_path)) is None
+    store_cached_features("ab" * 32, features, str(tmp_path))
+    np.testing.assert_array_equal(load_cached_features("ab" * 32, str(tmp_path)), features)
+
+def test_prune_evicts_least_recently_used_until_it_fits(tmp_path):
+    keys = [f"{i:02x}" * 32 for i in range(4)]
+    for age, key in enumerate(keys):
+        store_cached_features(key, np.zeros(1000, dtype=np.uint8), str(tmp_path))
+        entry_path = feature_cache._entry_path(key, str(tmp_path))
+        os.utime(entry_path, (1000 - age, 1000 - age))
+    entry_size = os.path.getsize(feature_cache._entry_path(keys[0], str(tmp_path)))
+
+    # A hit refreshes the oldest entry, so the two next oldest are evicted instead
+    assert load_cached_features(keys[3], str(tmp_path)) is not None
+    assert prune_feature_cache(str(tmp_path), max_bytes=2 * entry_size) == 2
+    remaining = [key for key in keys if os.path.exists(feature_cache._entry_path(key, str(tmp_path)))]
+    assert remaining == [keys[0], keys[3]]
+    assert prune_feature_cache(str(tmp_path), max_bytes=2 * entry_size) == 0
+
+def test_cached_load_processes_each_file_once(tmp_path, monkeypatch):
+    audio = tmp_path / "a.wav"
+    audio.write_bytes(b"contents")
+    calls = []
+
+    def process(file_path, max_bins=128):
+        calls.append((file_path, max_bins))
+        return np.full((3, 4), max_bins, dtype=np.float32)
+
+    monkeypatch.setattr(feature_cache, "load_and_process_audio", process)
+    cache_dir = str(tmp_path / "cache")
+    first = cached_load_and_process_audio(str(audio), 128, cache_dir)
+    np.testing.assert_array_equal(cached_load_and_process_audio(str(audio), 128, cache_dir), first)
+    assert len(calls) == 1
+
+    cached_load_and_process_audio(str(audio), 64, cache_dir)
+    audio.write_bytes(b"changed")
+    cached_load_and_process_audio(str(audio), 128, cache_dir)
+    assert len(calls) == 3
+
+def test_failed_extractions_are_not_cached(tmp_path, monkeypatch):
+    audio = tmp_path / "a.wav"
+    audio.write_bytes(b"contents")
+    calls = []
+    monkeypatch.setattr(feature_cache, "load_and_process_audio", lambda *args: calls.append(args) or np.array([]))
+    cached_load_and_process_audio(str(audio), 128, str(tmp_path / "cache"))
+    cached_load_and_process_audio(str(audio), 128, str(tmp_path / "cache"))
+    assert len(calls) == 2
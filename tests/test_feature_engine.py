@@ -0,0 +1,20 @@
+import numpy as np
+from benchmark_feature_engine import synthesize_track
+from feature_engine import extract_segment_features, extract_track_features
+from numpy_processing import SAMPLE_RATE, process_audio
+from three_seconds_segmentation import split_into_segments
+
+def test_shared_stft_matches_per_segment_features():
+    y = synthesize_track(duration=9)
+    segments = split_into_segments(y, SAMPLE_RATE)
+    reference = np.stack([process_audio(segment, SAMPLE_RATE) for segment in segments])
+
+    features = extract_track_features(y)
+
+    assert features.shape == reference.shape == (3, 153, 259)
+    assert np.allclose(features, reference, atol=1e-4)
+
+def test_segment_batch_matches_whole_track():
+    y = synthesize_track(duration=9, seed=1)
+    segments = split_into_segments(y, SAMPLE_RATE)
+    assert np.allclose(extract_segment_features(segments), extract_track_features(y), atol=1e-5)
@@ -0,0 +1,86 @@
+import os
+import numpy as np
+import pytest
+from feature_store import FeatureStore, FeatureStoreWriter, convert_to_feature_store, is_feature_store
+
+SHAPE = (4, 6)
+
+def random_features(n, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.standard_normal((n,) + SHAPE).astype(np.float32)
+    y = np.eye(3, dtype=np.float32)[rng.integers(0, 3, n)]
+    return X, y
+
+def write_store(store_dir, X, y, **kwargs):
+    with FeatureStoreWriter(store_dir, SHAPE, num_classes=3, **kwargs) as writer:
+        # Appends that do not line up with the shards
+        for start in range(0, len(X), 7):
+            writer.append(X[start:start + 7], y[start:start + 7])
+
+def test_round_trip_across_shards(tmp_path):
+    X, y = random_features(25)
+    write_store(str(tmp_path), X, y, dtype='float32', shard_size=10)
+    store = FeatureStore(str(tmp_path), max_cached_shards=1)
+
+    assert len(store.shards) == 3
+    assert store.shape == (25,) + SHAPE and store.dtype == np.float32
+    assert np.array_equal(np.asarray(store), X)
+    assert np.array_equal(store.labels(), y)
+    assert np.array_equal(store.labels(one_hot=False), np.argmax(y, axis=1))
+    # Gathers in the given order, across shards
+    assert np.array_equal(store.take([24, 3, 15, 3]), X[[24, 3, 15, 3]])
+
+def test_indexing_like_an_array(tmp_path):
+    X, y = random_features(25)
+    write_store(str(tmp_path), X, y, dtype='float32', shard_size=10)
+    store = FeatureStore(str(tmp_path))
+
+    assert np.array_equal(store[-1], X[-1])
+    assert np.array_equal(store[5:22:4], X[5:22:4])
+    assert np.array_equal(store[[-2, 0, 11]], X[[-2, 0, 11]])
+    assert np.array_equal(store[:, 0], X[:, 0])
+    assert np.array_equal(store[-3:, 1:3], X[-3:, 1:3])
+    rows = np.array([[3, 19], [19, -1]])
+    assert np.array_equal(store[rows, 2], X[rows, 2])
+    with pytest.raises(IndexError):
+        store.take([25])
+
+def test_float16_and_compressed_shards(tmp_path):
+    X, y = random_features(25)
+    write_store(str(tmp_path), X, y, dtype='float16', shard_size=10, compress=True)
+    store = FeatureStore(str(tmp_path))
+
+    assert all(shard["file"].endswith(".npz") for shard in store.shards)
+    assert store.storage_dtype == np.float16 and store.dtype == np.float32
+    assert np.allclose(np.asarray(store), X, atol=1e-2)
+
+def test_append_to_an_existing_store(tmp_path):
+    X, y = random_features(25)
+    write_store(str(tmp_path), X[:12], y[:12], dtype='float32', shard_size=10)
+    write_store(str(tmp_path), X[12:], y[12:], dtype='float32', shard_size=10)
+    store = FeatureStore(str(tmp_path))
+
+    assert len(store) == 25
+    assert np.array_equal(np.asarray(store), X)
+    assert np.array_equal(store.labels(), y)
+
+def test_append_with_another_feature_shape_is_rejected(tmp_path):
+    X, y = random_features(5)
+    write_store(str(tmp_path), X, y)
+    with pytest.raises(ValueError, match="cannot be appended"):
+        FeatureStoreWriter(str(tmp_path), (4, 7))
+
+def test_convert_and_remove_source(tmp_path):
+    X, y = random_features(25)
+    np.save(tmp_path / "Train_features.npy", X)
+    np.save(tmp_path / "Train_labels.npy", y)
+
+    written = convert_to_feature_store(str(tmp_path), dtype='float32', shard_size=8, remove_source=True)
+
+    assert written == [os.path.join(str(tmp_path), "Train")]
+    assert is_feature_store(written[0])
+    assert not os.path.exists(tmp_path / "Train_features.npy")
+    assert not os.path.exists(tmp_path / "Train_labels.npy")
+    store = FeatureStore(written[0])
+    assert np.array_equal(np.asarray(store), X)
+    assert np.array_equal(store.labels(), y)
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+import soundfile as sf
+from numpy_processing import SAMPLE_RATE
+from inference import spread_order, is_confident, classify_anytime, prepare_batch
+
+@pytest.mark.parametrize("n_segments", [0, 1, 2, 3, 7, 8, 10, 33, 100])
+def test_spread_order_is_a_permutation(n_segments):
+    assert sorted(spread_order(n_segments)) == list(range(n_segments))
+
+def test_spread_order_prefixes_cover_the_track():
+    assert spread_order(8).tolist() == [0, 4, 2, 6, 1, 5, 3, 7]
+    for n_segments in (10, 33, 100, 257):
+        order = spread_order(n_segments)
+        assert order[:4].tolist() == [0, n_segments // 2, n_segments // 4, 3 * n_segments // 4]
+        prefix = 1
+        while prefix <= n_segments:
+            used = np.sort(order[:prefix])
+            # Every gap, including the one wrapping around the end of the track, is below twice the even spacing
+            gaps = np.diff(np.append(used, n_segments + used[0]))
+            assert gaps.max() < 2 * n_segments / prefix
+            prefix *= 2
+
+def test_is_confident():
+    probabilities = np.array([0.1, 9.0, 0.9])
+    assert is_confident(probabilities, 10, confidence=0.25, min_segments=10)
+    assert not is_confident(np.array([4.0, 5.0, 1.0]), 10, confidence=0.25, min_segments=10)
+    assert not is_confident(probabilities, 8, confidence=0.25, min_segments=10)
+    assert not is_confident(probabilities, 10, confidence=1.5, min_segments=10)
+
+class StubModel:
+    """
+    Predicts a softmax over the first 10 mel bins of each segment, or a fixed distribution if one is given.
+    """
+
+    def __init__(self, fixed=None):
+        self.fixed = fixed
+        self.calls = []
+
+    def predict(self, features, verbose=0):
+        self.calls.append(len(features))
+        if self.fixed is not None:
+            return np.tile(self.fixed, (len(features), 1))
+        logits = features[:, :10, :].mean(axis=2)
+        exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+        return exp / exp.sum(axis=1, keepdims=True)
+
+@pytest.fixture(scope="module")
+def track(tmp_path_factory):
+    path = tmp_path_factory.mktemp("audio") / "track.wav"
+    t = np.arange(20 * 3 * SAMPLE_RATE) / SAMPLE_RATE
+    y = 0.3 * np.sin(2 * np.pi * (220 + 20 * t) * t) + 0.05 * np.random.default_rng(0).standard_normal(len(t))
+    sf.write(path, y.astype(np.float32), SAMPLE_RATE)
+    return str(path)
+
+def test_classify_anytime_stops_on_a_clear_margin(track):
+    model = StubModel(fixed=np.eye(10, dtype=np.float32)[3])
+    updates = []
+    probabilities, used, total = classify_anytime(model, track, batch_size=4, confidence=0.25, min_segments=10,
+                                                  progress=updates.append)
+    assert total == 20
+    assert used == 12 and model.calls == [4, 4, 4]
+    assert int(np.argmax(probabilities)) == 3
+    assert [update["segments"] for update in updates] == [4, 8, 12]
+    assert updates[-1]["genre"] == "Disco"
+
+def test_classify_anytime_without_early_exit_matches_full_classification(track):
+    model = StubModel()
+    probabilities, used, total = classify_anytime(model, track, batch_size=6, confidence=1.5)
+    assert used == total == 20
+    expected = model.predict(prepare_batch(track)).sum(axis=0)
+    np.testing.assert_allclose(probabilities, expected, rtol=1e-4)
@@ -0,0 +1,91 @@
+import asyncio
+import io
+import json
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from inference_service import MicroBatcher, handle_connection
+
+class RecordingModel:
+    """
+    Predicts row i of a batch as a one-hot of (the first feature value of row i) % 10, and records every batch.
+    """
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def predict(self, x, batch_size=32, verbose=0):
+        self.batch_sizes.append(len(x))
+        return np.eye(10, dtype=np.float32)[x[:, 0, 0].astype(int) % 10]
+
+def features(values):
+    x = np.zeros((len(values), 153, 259), dtype=np.float32)
+    x[:, 0, 0] = values
+    return x
+
+async def with_batcher(model, test, **kwargs):
+    batcher = MicroBatcher(model, **kwargs)
+    task = asyncio.create_task(batcher.run())
+    try:
+        return await test(batcher)
+    finally:
+        task.cancel()
+
+def test_concurrent_requests_share_one_batch_and_get_their_own_rows():
+    model = RecordingModel()
+
+    async def test(batcher):
+        return await asyncio.gather(*(batcher.predict(features([i, i + 1])) for i in (1, 3, 5)))
+
+    results = asyncio.run(with_batcher(model, test, max_batch_size=64, max_wait_ms=50))
+
+    assert model.batch_sizes == [6]
+    for i, predictions in zip((1, 3, 5), results):
+        assert np.argmax(predictions, axis=1).tolist() == [i, i + 1]
+
+def test_a_bad_batch_fails_only_its_requests():
+    model = RecordingModel()
+
+    async def test(batcher):
+        bad = await asyncio.gather(batcher.predict(features([1])), batcher.predict(np.zeros((1, 10, 10), np.float32)),
+                                   return_exceptions=True)
+        good = await asyncio.wait_for(batcher.predict(features([7])), timeout=5)
+        return bad, good
+
+    bad, good = asyncio.run(with_batcher(model, test, max_wait_ms=50))
+    assert all(isinstance(result, ValueError) for result in bad)
+    assert np.argmax(good, axis=1).tolist() == [7]
+
+class Writer:
+    def __init__(self):
+        self.data = b""
+
+    def write(self, data):
+        self.data += data
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        pass
+
+def request(batcher, path, body):
+    async def send():
+        reader = asyncio.StreamReader()
+        reader.feed_data(f"POST {path} HTTP/1.1\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+        reader.feed_eof()
+        writer = Writer()
+        await handle_connection(reader, writer, batcher, ThreadPoolExecutor(1))
+        head, payload = writer.data.split(b"\r\n\r\n", 1)
+        return head.split(b"\r\n")[0].decode(), json.loads(payload)
+    return send()
+
+def test_http_errors_are_descriptive():
+    async def test(batcher):
+        buffer = io.BytesIO()
+        np.save(buffer, np.zeros((2, 10, 10), np.float32))
+        return (await request(batcher, "/predict/features", buffer.getvalue()),
+                await request(batcher, "/predict", b"not audio at all" * 100))
+
+    (shape_status, shape_body), (audio_status, audio_body) = asyncio.run(with_batcher(RecordingModel(), test))
+    assert shape_status == "HTTP/1.1 400 Bad Request" and "(n_segments, 153, 259)" in shape_body["error"]
+    assert audio_status == "HTTP/1.1 400 Bad Request" and audio_body["error"]
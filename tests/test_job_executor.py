@@ -0,0 +1,87 @@
+import os
+import threading
+import pytest
+from job_executor import JobExecutor, QueueFull
+
+def blocking_job(job, release, result=None):
+    release.wait(timeout=10)
+    return result
+
+@pytest.fixture
+def executor():
+    executor = JobExecutor(max_workers=1, max_queued=2)
+    yield executor
+    executor.shutdown(wait=True)
+
+def wait_until_running(job):
+    for _ in range(1000):
+        if job.position() == 0:
+            return
+        threading.Event().wait(0.01)
+    raise AssertionError("the job never started")
+
+def test_queue_positions_and_admission(executor):
+    release = threading.Event()
+    running = executor.submit(blocking_job, release, "first")
+    wait_until_running(running)
+    queued = [executor.submit(blocking_job, release, i) for i in range(2)]
+
+    assert [job.position() for job in queued] == [1, 2]
+    with pytest.raises(QueueFull):
+        executor.submit(blocking_job, release)
+    assert executor.stats()["rejected"] == 1
+
+    release.set()
+    assert running.result(timeout=10) == "first"
+    assert [job.result(timeout=10) for job in queued] == [0, 1]
+    assert executor.stats() == {"running": 0, "queued": 0, "completed": 3, "failed": 0, "rejected": 1}
+
+def test_cancel_drops_a_queued_job_and_frees_its_place(executor):
+    release = threading.Event()
+    running = executor.submit(blocking_job, release)
+    wait_until_running(running)
+    first, second = executor.submit(blocking_job, release), executor.submit(blocking_job, release)
+
+    first.cancel()
+    assert first.future.cancelled()
+    assert second.position() == 1
+    executor.submit(blocking_job, release)  # the cancelled job's place is free again
+
+    release.set()
+    running.result(timeout=10)
+    assert executor.stats()["completed"] == 3
+
+def test_cancel_asks_a_running_job_to_stop(executor):
+    started = threading.Event()
+
+    def cooperative_job(job):
+        started.set()
+        while not job.cancelled:
+            threading.Event().wait(0.01)
+        return "stopped"
+
+    job = executor.submit(cooperative_job)
+    started.wait(timeout=10)
+    job.cancel()
+    assert job.result(timeout=10) == "stopped"
+
+def test_scratch_dir_is_private_and_removed(executor):
+    def scratch_job(job):
+        path = os.path.join(job.scratch_dir, "segment.wav")
+        with open(path, "wb") as f:
+            f.write(b"data")
+        return job.scratch_dir
+
+    first, second = executor.submit(scratch_job), executor.submit(scratch_job)
+    first_dir, second_dir = first.result(timeout=10), second.result(timeout=10)
+    assert first_dir != second_dir
+    assert not os.path.exists(first_dir) and not os.path.exists(second_dir)
+
+def test_failed_jobs_are_counted_and_reraised(executor):
+    def failing_job(job):
+        raise RuntimeError("decoder failed")
+
+    job = executor.submit(failing_job)
+    with pytest.raises(RuntimeError, match="decoder failed"):
+        job.result(timeout=10)
+    assert executor.stats()["failed"] == 1
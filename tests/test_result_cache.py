@@ -0,0 +1,73 @@
+import os
+import pytest
+import result_cache
+from result_cache import ResultCache, youtube_video_id
+
+@pytest.mark.parametrize("url", [
+    "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+    "https://www.youtube.com/watch?feature=share&v=dQw4w9WgXcQ&t=42s&list=PL123",
+    "youtube.com/watch?v=dQw4w9WgXcQ",
+    "https://m.youtube.com/watch?v=dQw4w9WgXcQ",
+    "https://youtu.be/dQw4w9WgXcQ?si=abc&t=10",
+    "  https://youtu.be/dQw4w9WgXcQ  ",
+    "https://www.youtube.com/shorts/dQw4w9WgXcQ?feature=share",
+    "https://www.youtube.com/embed/dQw4w9WgXcQ",
+    "https://www.youtube-nocookie.com/embed/dQw4w9WgXcQ",
+])
+def test_video_id_of_common_url_forms(url):
+    assert youtube_video_id(url) == "dQw4w9WgXcQ"
+
+@pytest.mark.parametrize("url", [
+    "https://www.youtube.com/watch?v=tooshort",
+    "https://www.youtube.com/channel/UC1234567890",
+    "https://example.com/watch?v=dQw4w9WgXcQ",
+    "not a url",
+])
+def test_video_id_of_other_urls(url):
+    assert youtube_video_id(url) is None
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(result_cache.time, "time", lambda: now[0])
+    return now
+
+def test_memory_and_disk_tiers(tmp_path, clock):
+    cache = ResultCache("v1", str(tmp_path), max_entries=1)
+    key, other = cache.upload_key(b"a"), cache.upload_key(b"b")
+    assert cache.get(key) is None
+    cache.put(key, {"genre": "rock"})
+    assert cache.get(key) == {"genre": "rock"}
+    # The second entry evicts the first from memory, which is then served from disk
+    cache.put(other, {"genre": "jazz"})
+    assert cache.get(key) == {"genre": "rock"}
+    assert ResultCache("v1", str(tmp_path)).get(other) == {"genre": "jazz"}
+    assert cache.stats() == {"memory_hits": 1, "disk_hits": 1, "misses": 1, "entries_in_memory": 1}
+
+def test_keys_depend_on_model_version_and_video(tmp_path):
+    cache = ResultCache("v1", str(tmp_path))
+    assert cache.youtube_key("https://youtu.be/dQw4w9WgXcQ") == \
+        cache.youtube_key("https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=5")
+    assert cache.upload_key(b"a") != ResultCache("v2", str(tmp_path)).upload_key(b"a")
+    assert cache.upload_key(b"a") != cache.upload_key(b"b")
+
+def test_entries_expire_in_both_tiers(tmp_path, clock):
+    cache = ResultCache("v1", str(tmp_path), ttl_seconds=60)
+    key = cache.upload_key(b"a")
+    cache.put(key, [1, 2])
+    clock[0] += 59
+    assert cache.get(key) == [1, 2]
+    clock[0] += 2
+    assert cache.get(key) is None
+    assert ResultCache("v1", str(tmp_path), ttl_seconds=60).get(key) is None
+    assert cache.stats()["misses"] == 1
+
+def test_prune_deletes_expired_disk_entries(tmp_path):
+    cache = ResultCache("v1", str(tmp_path), ttl_seconds=60)
+    old, new = cache.upload_key(b"old"), cache.upload_key(b"new")
+    cache.put(old, 1)
+    cache.put(new, 2)
+    os.utime(cache._entry_path(old), (0, 0))
+    assert cache.prune() == 1
+    assert not os.path.exists(cache._entry_path(old))
+    assert os.path.exists(cache._entry_path(new))
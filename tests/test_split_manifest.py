@@ -0,0 +1,66 @@
+import os
+import pytest
+from split_manifest import create_split_manifest, materialize_split, read_manifest, SUBSETS
+import split_manifest
+
+@pytest.fixture
+def dataset(tmp_path):
+    for genre in ("blues", "rock"):
+        os.makedirs(tmp_path / "genres" / genre)
+        for i in range(10):
+            (tmp_path / "genres" / genre / f"{genre}.{i}.wav").write_bytes(os.urandom(256))
+    return tmp_path
+
+def subsets(rows):
+    return {os.path.basename(row["path"]): row["subset"] for row in rows}
+
+def test_update_keeps_subsets_and_only_hashes_new_files(dataset, monkeypatch):
+    manifest = str(dataset / "split.csv")
+    first = subsets(create_split_manifest(str(dataset / "genres"), manifest))
+
+    hashed = []
+    file_sha256 = split_manifest.file_sha256
+    monkeypatch.setattr(split_manifest, "file_sha256", lambda path: hashed.append(path) or file_sha256(path))
+    (dataset / "genres" / "rock" / "new.wav").write_bytes(os.urandom(256))
+    (dataset / "genres" / "blues" / "copy.wav").write_bytes((dataset / "genres" / "blues" / "blues.0.wav").read_bytes())
+    os.remove(dataset / "genres" / "rock" / "rock.3.wav")
+    second = subsets(create_split_manifest(str(dataset / "genres"), manifest))
+
+    assert sorted(os.path.basename(path) for path in hashed) == ["copy.wav", "new.wav"]
+    assert "rock.3.wav" not in second
+    assert {name: subset for name, subset in second.items() if name in first} == \
+        {name: subset for name, subset in first.items() if name != "rock.3.wav"}
+    # An identical copy joins the subset of its original, so it cannot leak across subsets
+    assert second["copy.wav"] == second["blues.0.wav"]
+    assert second["new.wav"] in SUBSETS
+    assert subsets(read_manifest(manifest)) == second
+
+def test_modified_file_is_rehashed(dataset):
+    manifest = str(dataset / "split.csv")
+    create_split_manifest(str(dataset / "genres"), manifest)
+    path = dataset / "genres" / "blues" / "blues.5.wav"
+    path.write_bytes(os.urandom(512))
+    rows = {os.path.basename(row["path"]): row for row in create_split_manifest(str(dataset / "genres"), manifest)}
+    assert rows["blues.5.wav"]["sha256"] == split_manifest.file_sha256(str(path))
+    assert rows["blues.5.wav"]["size"] == "512"
+
+def test_new_parameters_resplit_from_scratch(dataset):
+    manifest = str(dataset / "split.csv")
+    create_split_manifest(str(dataset / "genres"), manifest, seed=1)
+    updated = subsets(create_split_manifest(str(dataset / "genres"), manifest, seed=2))
+    fresh = subsets(create_split_manifest(str(dataset / "genres"), str(dataset / "fresh.csv"), seed=2))
+    assert updated == fresh
+
+def test_materialize_removes_tracks_that_moved(dataset):
+    rows = create_split_manifest(str(dataset / "genres"), str(dataset / "split.csv"), seed=1)
+    output = dataset / "split"
+    materialize_split(rows, str(output), link="copy")
+    rows = create_split_manifest(str(dataset / "genres"), str(dataset / "split.csv"), seed=2)
+    materialize_split(rows, str(output), link="copy")
+
+    on_disk = {}
+    for subset in SUBSETS:
+        for genre in os.listdir(output / subset):
+            for filename in os.listdir(output / subset / genre):
+                on_disk.setdefault(filename, []).append(subset)
+    assert on_disk == {name: [subset] for name, subset in subsets(rows).items()}
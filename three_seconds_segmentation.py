@@ -1,53 +1,64 @@
 import os
 import soundfile as sf
 import librosa
+from concurrent.futures import ProcessPoolExecutor
+import instrumentation
+from instrumentation import stage, count
+from split_manifest import read_manifest
 
-def segment_music_files(input_path, output_dir, segment_duration=3):
+def segment_music_files(input_path, output_dir, segment_duration=3, sr=22050, num_workers=1):
     """
     Segments the audio files in the input path and copies the segmented files
     to the output directory, maintaining the same folder structure.
 
     Args:
-        input_path (str): The path to the input file or directory containing the audio files.
+        input_path (str): The path to the input file or directory containing the audio files, or a
+            split manifest (`.csv`, see `split_manifest`) whose files are segmented into
+            `output_dir/<subset>/<genre>`.
         output_dir (str): The path to the output directory where the segmented files will be copied.
         segment_duration (int, optional): The duration of each audio segment in seconds. Defaults to 3.
+        sr (int, optional): The sampling rate each source is decoded at, once, and the segments are
+            written at. Use 44100 to match the feature extraction and avoid resampling every segment
+            again later. Defaults to 22050.
+        num_workers (int, optional): The number of worker processes. Defaults to 1 (current process).
+
+    Returns:
+        list: A (file_path, error_message) pair for every file that could not be segmented.
     """
-    # Check if the input path is a file or a directory
-    if os.path.isfile(input_path):
+    # Check if the input path is a manifest, a file or a directory
+    if input_path.lower().endswith('.csv'):
+        tasks = [(row["path"], os.path.join(output_dir, row["subset"], row["genre"]), segment_duration, sr)
+                 for row in read_manifest(input_path) if row["path"].lower().endswith('.wav')]
+    elif os.path.isfile(input_path):
         # Handle a single file
-        segment_single_file(input_path, output_dir, segment_duration)
+        segment_single_file(input_path, output_dir, segment_duration, sr)
+        return []
     else:
         # Handle a directory structure
+        tasks = []
         for root, dirs, files in os.walk(input_path):
-            for filename in files:
+            for filename in sorted(files):
                 if filename.lower().endswith('.wav'):
-                    file_path = os.path.join(root, filename)
-                    try:
-                        # Load the audio file using librosa
-                        audio_file, sr = librosa.load(file_path)
-
-                        # Create the output subfolder if it doesn't exist
-                        relative_path = os.path.relpath(root, input_path)
-                        output_subfolder = os.path.join(output_dir, relative_path)
-                        os.makedirs(output_subfolder, exist_ok=True)
+                    # Mirror the input folder structure in the output directory
+                    relative_path = os.path.relpath(root, input_path)
+                    output_subfolder = os.path.join(output_dir, relative_path)
+                    tasks.append((os.path.join(root, filename), output_subfolder, segment_duration, sr))
 
-                        # Loop through the audio data in 3-second chunks
-                        segment_count = 0
-                        for i in range(0, len(audio_file), int(segment_duration * sr)):
-                            segment = audio_file[i:i + int(segment_duration * sr)]
+    if num_workers > 1:
+        with ProcessPoolExecutor(num_workers) as executor:
+            results = list(executor.map(_segment_file, tasks, chunksize=4))
+    else:
+        results = [_segment_file(task) for task in tasks]
 
-                            # Check if the segment is non-empty before saving
-                            if len(segment) >= int(segment_duration * sr) and len(segment) > 0:
-                                # Create a new filename for the segment
-                                new_filename = f"{os.path.splitext(filename)[0]}_segment_{segment_count}.wav"
-                                new_file_path = os.path.join(output_subfolder, new_filename)
-                                # Save the segment to the output folder
-                                sf.write(new_file_path, segment, sr)
-                                segment_count += 1
-                    except Exception as e:
-                        print(f"Error processing file {filename}: {e}")
+    # Fold the metrics recorded in the worker processes into this one
+    for _, _, metrics in results:
+        instrumentation.merge(metrics)
+    errors = [(file_path, error) for file_path, error, _ in results if error is not None]
+    for file_path, error in errors:
+        print(f"Error processing file {os.path.basename(file_path)}: {error}")
+    return errors
 
-def segment_single_file(input_file, output_dir, segment_duration=3):
+def segment_single_file(input_file, output_dir, segment_duration=3, sr=22050):
     """
     Segments a single audio file into 3-second chunks and saves them in the output directory.
 
@@ -55,23 +66,61 @@ def segment_single_file(input_file, output_dir, segment_duration=3):
         input_file (str): The path to the input audio file.
         output_dir (str): The path to the output directory where the segmented files will be saved.
         segment_duration (int, optional): The duration of each audio segment in seconds. Defaults to 3.
+        sr (int, optional): The sampling rate to decode and write the segments at. Defaults to 22050.
     """
     # Create the output directory if it doesn't exist
     os.makedirs(output_dir, exist_ok=True)
 
     # Load the audio file
-    audio_file, sr = librosa.load(input_file)
+    audio_file, sr = librosa.load(input_file, sr=sr)
+
+    # Save every full 3-second chunk
+    for segment_count, segment in enumerate(split_into_segments(audio_file, sr, segment_duration)):
+        # Create a new filename for the segment
+        new_filename = f"segment_{segment_count}.wav"
+        new_file_path = os.path.join(output_dir, new_filename)
+        # Save the segment to the output folder
+        sf.write(new_file_path, segment, sr)
+
+def split_into_segments(audio, sr, segment_duration=3):
+    """
+    Splits an in-memory audio signal into consecutive full-length segments.
+
+    Args:
+        audio (numpy.ndarray): The mono audio signal.
+        sr (int): The sampling rate of the signal.
+        segment_duration (int, optional): The duration of each audio segment in seconds. Defaults to 3.
+
+    Returns:
+        numpy.ndarray: A (n_segments, segment_samples) view of the signal. A trailing
+        partial segment is dropped, the same way the file-based segmentation does.
+    """
+    segment_samples = int(segment_duration * sr)
+    n_segments = len(audio) // segment_samples
+    return audio[:n_segments * segment_samples].reshape(n_segments, segment_samples)
+
+def _segment_file(task):
+    file_path, output_subfolder, segment_duration, sr = task
+    try:
+        # Decode the audio file once, directly at the target sampling rate
+        with stage("decode"):
+            audio_file, sr = librosa.load(file_path, sr=sr)
+        count("files_decoded")
 
-    # Loop through the audio data in 3-second chunks
-    segment_count = 0
-    for i in range(0, len(audio_file), int(segment_duration * sr)):
-        segment = audio_file[i:i + int(segment_duration * sr)]
+        # Create the output subfolder if it doesn't exist
+        os.makedirs(output_subfolder, exist_ok=True)
 
-        # Check if the segment is non-empty before saving
-        if len(segment) >= int(segment_duration * sr) and len(segment) > 0:
-            # Create a new filename for the segment
-            new_filename = f"segment_{segment_count}.wav"
-            new_file_path = os.path.join(output_dir, new_filename)
-            # Save the segment to the output folder
-            sf.write(new_file_path, segment, sr)
-            segment_count += 1
+        # Save every full 3-second chunk
+        segments = split_into_segments(audio_file, sr, segment_duration)
+        with stage("segment_write"):
+            for segment_count, segment in enumerate(segments):
+                # Create a new filename for the segment
+                new_filename = f"{os.path.splitext(os.path.basename(file_path))[0]}_segment_{segment_count}.wav"
+                new_file_path = os.path.join(output_subfolder, new_filename)
+                # Save the segment to the output folder
+                sf.write(new_file_path, segment, sr)
+        count("segments_written", len(segments))
+        return file_path, None, instrumentation.collect()
+    except Exception as e:
+        count("segmentation_failures")
+        return file_path, f"{type(e).__name__}: {e}", instrumentation.collect()